@@ -0,0 +1,54 @@
+"""
+Порівнює накладні витрати AES на одне повідомлення: старий шлях (base64-декодування ключа/IV,
+новий Cipher і PKCS7 padder на кожен виклик) проти контексту сесії, підготовленого в AesKey.
+
+Запуск з каталогу "console application":  python -m benchmarks.aes_per_message
+"""
+import base64
+import timeit
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives import padding as sym_padding
+from cryptography.hazmat.backends import default_backend
+from src.services.aes_service import AesService
+
+
+def legacy_encrypt(key_b64: str, iv_b64: str, plain_text: str) -> str:
+    key = base64.b64decode(key_b64)
+    iv = base64.b64decode(iv_b64)
+    padder = sym_padding.PKCS7(128).padder()
+    padded_data = padder.update(plain_text.encode("utf-8")) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend()).encryptor()
+    return base64.b64encode(encryptor.update(padded_data) + encryptor.finalize()).decode("utf-8")
+
+
+def legacy_decrypt(key_b64: str, iv_b64: str, cipher_text: str) -> str:
+    key = base64.b64decode(key_b64)
+    iv = base64.b64decode(iv_b64)
+    decryptor = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend()).decryptor()
+    padded_plain = decryptor.update(base64.b64decode(cipher_text)) + decryptor.finalize()
+    unpadder = sym_padding.PKCS7(128).unpadder()
+    return (unpadder.update(padded_plain) + unpadder.finalize()).decode("utf-8")
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main(number: int = 20000):
+    service = AesService()
+    aes_key = service.generate_secret_key()
+    print(f"{'message':>10} {'legacy, us':>12} {'session ctx, us':>16} {'speedup':>8}")
+    for size in (16, 256, 4096):
+        message = "x" * size
+        legacy_ct = legacy_encrypt(aes_key.key, aes_key.iv, message)
+        ct = service.encrypt(aes_key, message)
+        assert legacy_ct == ct and legacy_decrypt(aes_key.key, aes_key.iv, ct) == service.decrypt(aes_key, ct)
+
+        # Один обмін у receive_encrypted_message: decrypt запиту + encrypt відповіді
+        legacy = per_call_us(lambda: legacy_encrypt(aes_key.key, aes_key.iv, legacy_decrypt(aes_key.key, aes_key.iv, ct)), number)
+        prepared = per_call_us(lambda: service.encrypt(aes_key, service.decrypt(aes_key, ct)), number)
+        print(f"{size:>10} {legacy:>12.2f} {prepared:>16.2f} {legacy / prepared:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Пропускна здатність GET /employees/{id} з ErrorHandlerMiddleware на BaseHTTPMiddleware (як було)
+проти ASGI-варіанта з src/middleware/error_handler.py і без middleware взагалі.
+Запити подаються прямо в ASGI-застосунок, без мережі й HTTP-клієнта, тож видно лише витрати сервера.
+
+Запуск з каталогу "console application":
+    python -m benchmarks.error_middleware --requests 20000 --concurrency 1,32 --json middleware.json
+"""
+import argparse
+import asyncio
+import time
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from benchmarks.report import summarize, print_table, write_json
+from src.api import employees
+from src.middleware import error_handler
+from src.middleware.error_handler import ErrorHandlerMiddleware
+from src.models.employee_model import Employee
+from src.services.employee_service import get_employee_service
+
+
+class LegacyErrorHandlerMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        try:
+            return await call_next(request)
+        except Exception as exc:
+            return JSONResponse(
+                status_code=500,
+                content={"error": "Internal Server Error"}
+            )
+
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    app.include_router(employees.router)
+    if middleware is not None:
+        app.add_middleware(middleware)
+    error_handler.setup_exception_handlers(app)
+    return app
+
+
+async def call(app, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode("ascii"), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run(app, path: str, requests: int, concurrency: int) -> tuple:
+    samples = []
+    queue = iter(range(requests))
+
+    async def worker():
+        for _ in queue:
+            start = time.perf_counter()
+            status = await call(app, path)
+            samples.append(time.perf_counter() - start)
+            if status != 200:
+                raise RuntimeError(f"Unexpected status {status}")
+
+    # Прогрів: маршрутизатор і стек middleware будуються під час першого запиту
+    await call(app, path)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", default="1,32", help="кількість одночасних запитів через кому")
+    parser.add_argument("--json", help="куди записати звіт JSON (\"-\" - stdout)")
+    args = parser.parse_args()
+
+    service = get_employee_service()
+    employee = service.find_duplicate("Bench", "Middleware", 42)
+    if employee is None:
+        employee = service.create_employee(Employee(firstName="Bench", lastName="Middleware", age=42))
+    path = f"/employees/{employee.id}"
+
+    variants = {
+        "base_http_middleware": LegacyErrorHandlerMiddleware,
+        "asgi_middleware": ErrorHandlerMiddleware,
+        "no_middleware": None,
+    }
+    results = []
+    for concurrency in (int(c) for c in args.concurrency.split(",") if c):
+        for name, middleware in variants.items():
+            samples, wall = asyncio.run(run(build_app(middleware), path, args.requests, concurrency))
+            results.append(summarize(f"get_employee.{name}", samples, wall=wall, concurrency=concurrency))
+
+    if args.json != "-":
+        print_table(results)
+    if args.json:
+        write_json("error_middleware", results, args.json, requests=args.requests, concurrency=args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
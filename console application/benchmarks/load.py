@@ -0,0 +1,130 @@
+"""
+Генератор навантаження на захищений канал: N одночасних сесій AsyncSecureClient.
+За замовчуванням застосунок цього каталогу (main.app) викликається в тому самому процесі
+через httpx.ASGITransport, без мережі; з --url навантаження йде на запущений сервер.
+Кожна сесія проходить рукостискання (з --resume ще й відновлення за квитком),
+потім надсилає --messages повідомлень, тримаючи до --in-flight з них у польоті одночасно.
+
+Запуск з каталогу "console application":
+    python -m benchmarks.load --sessions 50 --messages 100 --json load.json
+    python -m benchmarks.load --url http://localhost:8002 --sessions 200 --binary
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from typing import Optional
+import httpx
+from benchmarks.report import summarize, print_table, write_json
+from src.client.async_client import AsyncSecureClient
+from src.client.client import SUITE_CBC, SUITE_GCM
+
+
+class Phase:
+    """Тривалості операцій однієї фази та час від першого старту до останнього завершення."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = []
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+    async def timed(self, coro):
+        """Рахує лише успішні операції; помилки рахуються окремо в run_session."""
+        start = time.perf_counter()
+        if self.first is None:
+            self.first = start
+        result = await coro
+        end = time.perf_counter()
+        self.samples.append(end - start)
+        self.last = end if self.last is None else max(self.last, end)
+        return result
+
+    def summary(self, **params) -> dict:
+        wall = (self.last - self.first) if self.samples else None
+        return summarize(self.name, self.samples, wall=wall, **params)
+
+
+async def run_session(http: httpx.AsyncClient, args, phases: dict, errors: Counter):
+    client = AsyncSecureClient(server_url=args.base_url, cipher_suite=args.suite, binary=args.binary, http=http)
+    message = "x" * args.size
+    try:
+        await phases["handshake"].timed(client.connect())
+        if args.resume:
+            await phases["resume"].timed(client.connect())
+    except Exception as e:
+        errors[f"handshake: {str(e)[:100]}"] += 1
+        return
+
+    in_flight = asyncio.Semaphore(args.in_flight)
+
+    async def send():
+        async with in_flight:
+            try:
+                await phases["message"].timed(client.send_encrypted_message(message))
+            except Exception as e:
+                errors[f"message: {str(e)[:100]}"] += 1
+
+    await asyncio.gather(*(send() for _ in range(args.messages)))
+
+
+async def drive(http: httpx.AsyncClient, args) -> tuple:
+    phases = {name: Phase(f"load.{name}") for name in ("handshake", "resume", "message")}
+    errors = Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(http, args, phases, errors) for _ in range(args.sessions)))
+    wall = time.perf_counter() - start
+
+    params = {"sessions": args.sessions, "suite": args.suite, "binary": args.binary}
+    results = [phases[name].summary(**params) for name in ("handshake", "resume") if phases[name].samples]
+    if phases["message"].samples:
+        results.append(phases["message"].summary(bytes=args.size, in_flight=args.in_flight, **params))
+
+    response = await http.get(f"{args.base_url}/api/secure/crypto-stats")
+    server_stats = response.json() if response.status_code == 200 else None
+    return results, dict(errors), wall, server_stats
+
+
+async def run(args) -> tuple:
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    if args.url:
+        args.base_url = args.url.rstrip("/")
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as http:
+            return await drive(http, args)
+
+    # Імпорт лише для режиму в процесі: застосунок стартує зі своїм lifespan (пул ключів, ключ сервера)
+    import main as server
+    args.base_url = "http://bench"
+    transport = httpx.ASGITransport(app=server.app)
+    async with server.lifespan(server.app):
+        async with httpx.AsyncClient(transport=transport, limits=limits, timeout=args.timeout) as http:
+            return await drive(http, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адреса запущеного сервера; без неї - застосунок у цьому процесі")
+    parser.add_argument("--sessions", type=int, default=20, help="кількість одночасних сесій")
+    parser.add_argument("--messages", type=int, default=50, help="повідомлень на сесію")
+    parser.add_argument("--in-flight", type=int, default=1, help="скільки повідомлень сесії в польоті одночасно")
+    parser.add_argument("--size", type=int, default=256, help="розмір повідомлення, символів")
+    parser.add_argument("--suite", choices=(SUITE_GCM, SUITE_CBC), default=SUITE_GCM)
+    parser.add_argument("--binary", action="store_true", help="application/octet-stream замість JSON")
+    parser.add_argument("--resume", action="store_true", help="після рукостискання ще раз підключитись за квитком")
+    parser.add_argument("--connections", type=int, default=100, help="розмір пулу з'єднань клієнта")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="куди записати звіт JSON (\"-\" - stdout)")
+    args = parser.parse_args()
+
+    results, errors, wall, server_stats = asyncio.run(run(args))
+
+    if args.json != "-":
+        print_table(results)
+        print(f"wall {wall:.2f} s, errors: {errors or 'none'}")
+    if args.json:
+        config = {k: v for k, v in vars(args).items() if k != "json"}
+        write_json("load", results, args.json, wall_sec=wall, errors=errors, server_stats=server_stats, **config)
+
+
+if __name__ == "__main__":
+    main()
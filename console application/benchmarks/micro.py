@@ -0,0 +1,154 @@
+"""
+Мікробенчмарки: генерація RSA ключів, RSA-OAEP encrypt/decrypt, AES encrypt/decrypt
+та операції EmployeeService на 1k/100k/1M записів.
+
+Запуск з каталогу "console application":
+    python -m benchmarks.micro
+    python -m benchmarks.micro --only employees --sizes 1000,100000 --json micro.json
+"""
+import argparse
+import os
+import random
+import time
+import uuid
+from cryptography.hazmat.primitives import serialization
+from benchmarks.report import summarize, print_table, write_json
+from src.models.employee_model import Employee
+from src.services.aes_service import AesService, AesKey, SUITE_CBC, SUITE_GCM
+from src.services.employee_service import EmployeeService
+from src.services.employee_storage import MemoryStorage
+from src.services.rsa_service import RsaService
+
+
+def measure(fn, count: int) -> list:
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def crypto_benchmarks(ops: int, slow_ops: int) -> list:
+    results = []
+    rsa_service = RsaService()
+    aes_service = AesService()
+
+    results.append(summarize("rsa.keygen", measure(lambda i: rsa_service.generate_crypto_keys(), slow_ops)))
+
+    keys = rsa_service.generate_crypto_keys()
+    pem = keys.private_key.encode("utf-8")
+    # Розбір PEM з перевіркою ключа коштує як генерація, тому рахується тією ж малою кількістю разів
+    results.append(summarize(
+        "rsa.pem_parse", measure(lambda i: serialization.load_pem_private_key(pem, password=None), slow_ops)
+    ))
+
+    # Розмір ключа AES - саме те, що шифрується RSA під час рукостискання
+    secret = os.urandom(32)
+    cipher_bytes = rsa_service.encrypt_bytes(keys, secret)
+    results.append(summarize("rsa.encrypt", measure(lambda i: rsa_service.encrypt_bytes(keys, secret), ops)))
+    results.append(summarize("rsa.decrypt", measure(lambda i: rsa_service.decrypt_bytes(keys, cipher_bytes), ops)))
+
+    for suite in (SUITE_CBC, SUITE_GCM):
+        plain = aes_service.generate_secret_key()
+        aes_key = AesKey(key=plain.key, iv=plain.iv, cipher_suite=suite)
+        for size in (256, 4096, 65536):
+            data = os.urandom(size)
+            ct = aes_service.encrypt_bytes(aes_key, data)
+            results.append(summarize(
+                "aes.encrypt", measure(lambda i: aes_service.encrypt_bytes(aes_key, data), ops), suite=suite, bytes=size
+            ))
+            results.append(summarize(
+                "aes.decrypt", measure(lambda i: aes_service.decrypt_bytes(aes_key, ct), ops), suite=suite, bytes=size
+            ))
+    return results
+
+
+class PreparedStorage(MemoryStorage):
+    """Сховище в пам'яті, що віддає заздалегідь серіалізовані записи, як SQLite-файл під час запуску."""
+
+    def __init__(self, records: list):
+        self.records = records
+
+    def load(self):
+        return iter(self.records)
+
+
+def fresh_service(count: int) -> EmployeeService:
+    """Новий екземпляр сервісу (а не спільний singleton) з count записами, завантаженими через _load."""
+    records = [
+        (seq, '{"id":"%s","firstName":"First%d","lastName":"Last%05d","age":%d}'
+         % (uuid.uuid4(), seq, random.randrange(100000), 18 + seq % 50))
+        for seq in range(1, count + 1)
+    ]
+    shared, EmployeeService._instance = EmployeeService._instance, None
+    saved_path = os.environ.pop("EMPLOYEES_DB_PATH", None)
+    try:
+        service = EmployeeService()
+    finally:
+        EmployeeService._instance = shared
+        if saved_path is not None:
+            os.environ["EMPLOYEES_DB_PATH"] = saved_path
+    service.storage = PreparedStorage(records)
+    service._load()
+    service.storage = MemoryStorage()
+    return service
+
+
+def employee_benchmarks(sizes: list, ops: int) -> list:
+    results = []
+    for size in sizes:
+        service = fresh_service(size)
+        rng = random.Random(size)
+        ids = list(service.employees)
+        picked = [rng.choice(ids) for _ in range(ops)]
+        existing = [service.employees[employee_id] for employee_id in picked]
+        fresh = [Employee(firstName=f"New{i}", lastName=f"Bench{i:05d}", age=30) for i in range(ops)]
+        doomed = rng.sample(ids, min(ops, len(ids)))
+
+        def row(name, samples):
+            results.append(summarize(name, samples, records=size))
+
+        row("employees.get", measure(lambda i: service.get_employee(picked[i]), ops))
+        row("employees.find_duplicate", measure(
+            lambda i: service.find_duplicate(existing[i].firstName, existing[i].lastName, existing[i].age), ops
+        ))
+        row("employees.page_created", measure(lambda i: service.query_employees(50), ops))
+        row("employees.page_age", measure(lambda i: service.query_employees(50, sort="age", min_age=40), ops))
+        row("employees.page_last_name", measure(
+            lambda i: service.query_employees(50, sort="lastName", name_prefix="Last5"), ops
+        ))
+        row("employees.create", measure(lambda i: service.create_employee(fresh[i]), ops))
+        # Зміна віку переставляє запис в індексі за віком
+        row("employees.update", measure(
+            lambda i: service.update_employee(picked[i], existing[i].firstName, existing[i].lastName, existing[i].age + 50),
+            ops
+        ))
+        row("employees.delete", measure(lambda i: service.delete_employee(doomed[i]), len(doomed)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", choices=("crypto", "employees"), help="запустити лише одну групу")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="кількість записів EmployeeService через кому")
+    parser.add_argument("--ops", type=int, default=2000, help="операцій на кожен бенчмарк")
+    parser.add_argument("--slow-ops", type=int, default=10, help="генерацій RSA ключів і розборів PEM")
+    parser.add_argument("--json", help="куди записати звіт JSON (\"-\" - stdout)")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    results = []
+    if args.only in (None, "crypto"):
+        results += crypto_benchmarks(args.ops, args.slow_ops)
+    if args.only in (None, "employees"):
+        results += employee_benchmarks(sizes, args.ops)
+
+    if args.json != "-":
+        print_table(results)
+    if args.json:
+        write_json("micro", results, args.json, ops=args.ops, slow_ops=args.slow_ops, sizes=sizes)
+
+
+if __name__ == "__main__":
+    main()
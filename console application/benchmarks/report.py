@@ -0,0 +1,69 @@
+"""
+Спільне для бенчмарків: зведення вибірок часу в перцентилі та вивід результатів
+таблицею і у JSON, щоб запуски можна було порівнювати між собою.
+"""
+import json
+import os
+import platform
+import sys
+import time
+from typing import List, Optional
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Перцентиль q (0..100) відсортованої вибірки з лінійною інтерполяцією."""
+    if not sorted_samples:
+        return 0.0
+    pos = (len(sorted_samples) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_samples) - 1)
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (pos - low)
+
+
+def summarize(name: str, samples: List[float], wall: Optional[float] = None, **params) -> dict:
+    """
+    samples - тривалості окремих операцій у секундах. Пропускна здатність рахується за wall
+    (загальний час з паралельністю), а без нього - як кількість операцій на сумарний час.
+    """
+    ordered = sorted(samples)
+    total = wall if wall is not None else sum(ordered)
+    return {
+        "name": name,
+        "params": params,
+        "ops": len(ordered),
+        "ops_per_sec": len(ordered) / total if total else 0.0,
+        "mean_us": sum(ordered) / len(ordered) * 1e6 if ordered else 0.0,
+        "p50_us": percentile(ordered, 50) * 1e6,
+        "p95_us": percentile(ordered, 95) * 1e6,
+        "p99_us": percentile(ordered, 99) * 1e6,
+        "max_us": ordered[-1] * 1e6 if ordered else 0.0,
+    }
+
+
+def print_table(results: List[dict]):
+    print(f"{'benchmark':<44} {'ops':>8} {'ops/s':>12} {'p50, us':>11} {'p95, us':>11} {'p99, us':>11}")
+    for r in results:
+        label = r["name"] + "".join(f" {k}={v}" for k, v in r["params"].items())
+        print(f"{label:<44} {r['ops']:>8} {r['ops_per_sec']:>12.1f} {r['p50_us']:>11.1f} {r['p95_us']:>11.1f} {r['p99_us']:>11.1f}")
+
+
+def write_json(kind: str, results: List[dict], path: str, **config):
+    """Записує звіт у path ("-" - у stdout) разом з параметрами запуску і середовищем."""
+    report = {
+        "benchmark": kind,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": config,
+        "environment": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if path == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
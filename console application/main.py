@@ -1,13 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.api import employees, secure_communication_router
+from src.api.secure_communication_router import server_key_ring
 from src.middleware.error_handler import ErrorHandlerMiddleware
 from src.middleware import error_handler
+from src.middleware import metrics
+from src.middleware.metrics import MetricsMiddleware
+from src.services.rsa_key_pool import key_pool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    key_pool.start()
+    server_key_ring.start()
+    yield
+    key_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(employees.router)
 app.include_router(secure_communication_router.router)
+app.include_router(metrics.router)
 
 app.add_middleware(ErrorHandlerMiddleware)
+# Додається останнім, тож охоплює і відповіді 500 від ErrorHandlerMiddleware
+app.add_middleware(MetricsMiddleware)
 error_handler.setup_exception_handlers(app)
 
 
@@ -1,35 +1,154 @@
-from typing import List
+from typing import List, Optional
+import json
 from fastapi import Form
 from uuid import UUID
-from fastapi import APIRouter, HTTPException, Depends
-from src.models.employee_model import Employee
-from src.services.employee_service import EmployeeService, get_employee_service
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from src.api.responses import FastJSONResponse, json_array
+from src.models.employee_model import Employee, EmployeeUpdate
+from src.services.employee_service import EmployeeService, DuplicateEmployeeError, get_employee_service
+from src.services.metrics import registry
 
 router = APIRouter()
 
-@router.get("/employees", response_model=List[Employee])
-def get_employees(employee_service: EmployeeService = Depends(get_employee_service)):
-    return employee_service.get_employees()
+registry.gauge_callback("employees", "Employees held by this worker", lambda: len(get_employee_service().employees))
 
+EXPORT_CHUNK_SIZE = 1000
+MAX_BATCH_SIZE = 10000
 
-@router.get("/employees/{employee_id}", response_model=Employee)
+# Ендпоінти нижче повертають FastJSONResponse з готовими байтами записів (EmployeeService.encode_employees):
+# записи вже провалідовані, тож response_model лишається лише для схеми OpenAPI
+
+@router.get("/employees", response_model=List[Employee], response_class=FastJSONResponse)
+def get_employees(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = "created",
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+    name_prefix: Optional[str] = None,
+    employee_service: EmployeeService = Depends(get_employee_service)
+):
+    """
+    Сторінка працівників; курсор наступної сторінки - у заголовку X-Next-Cursor.
+    Фільтри, що не збігаються з sort (наприклад, name_prefix при sort=created), перевіряються
+    під час обходу індексу, а за один запит обходиться не більше 10000 записів. Тому сторінка
+    може бути коротшою за limit або порожньою, хоча X-Next-Cursor є: читайте, доки він не зникне.
+    """
+    try:
+        employees, next_cursor = employee_service.query_employees(
+            limit, cursor=cursor, sort=sort, min_age=min_age, max_age=max_age, name_prefix=name_prefix
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(json_array(employee_service.encode_employees(employees)), headers=headers)
+
+
+@router.get("/employees/export")
+def export_employees(employee_service: EmployeeService = Depends(get_employee_service)):
+    """Потокове вивантаження всіх працівників у форматі NDJSON, по EXPORT_CHUNK_SIZE записів на chunk."""
+    def generate():
+        for page in employee_service.iter_pages(EXPORT_CHUNK_SIZE):
+            yield b"".join(data + b"\n" for data in employee_service.encode_employees(page, cache=False))
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    status: int
+    employee: Optional[Employee] = None
+    error: Optional[str] = None
+
+
+async def read_batch(request: Request) -> list:
+    """Читає масив елементів з JSON-масиву або з NDJSON (Content-Type: application/x-ndjson)."""
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Batch body must be an array")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {MAX_BATCH_SIZE} items")
+    return items
+
+
+def validate_batch(items: list, model) -> tuple:
+    """Валідує весь пакет за один прохід: (валідні моделі з їх індексами, результати-помилки)."""
+    valid, errors = [], []
+    for idx, item in enumerate(items):
+        try:
+            valid.append((idx, model.model_validate(item)))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append(BatchItemResult(index=idx, status=422, error=message))
+    return valid, errors
+
+
+def batch_result(idx: int, result, success_status: int) -> BatchItemResult:
+    if isinstance(result, DuplicateEmployeeError):
+        return BatchItemResult(index=idx, status=400, error=str(result))
+    if result is None or result is False:
+        return BatchItemResult(index=idx, status=404, error="Employee not found")
+    if result is True:
+        return BatchItemResult(index=idx, status=success_status)
+    return BatchItemResult(index=idx, status=success_status, employee=result)
+
+
+@router.post("/employees/batch", response_model=List[BatchItemResult])
+async def create_employees_batch(request: Request, employee_service: EmployeeService = Depends(get_employee_service)):
+    valid, results = validate_batch(await read_batch(request), Employee)
+    created = await run_in_threadpool(employee_service.create_employees, [e for _, e in valid])
+    results.extend(batch_result(idx, result, 201) for (idx, _), result in zip(valid, created))
+    return sorted(results, key=lambda r: r.index)
+
+
+@router.patch("/employees/batch", response_model=List[BatchItemResult])
+async def update_employees_batch(request: Request, employee_service: EmployeeService = Depends(get_employee_service)):
+    valid, results = validate_batch(await read_batch(request), EmployeeUpdate)
+    updated = await run_in_threadpool(employee_service.update_employees, [u for _, u in valid])
+    results.extend(batch_result(idx, result, 200) for (idx, _), result in zip(valid, updated))
+    return sorted(results, key=lambda r: r.index)
+
+
+@router.delete("/employees/batch", response_model=List[BatchItemResult])
+async def delete_employees_batch(request: Request, employee_service: EmployeeService = Depends(get_employee_service)):
+    items = await read_batch(request)
+    valid, results = [], []
+    for idx, item in enumerate(items):
+        try:
+            valid.append((idx, UUID(str(item))))
+        except ValueError:
+            results.append(BatchItemResult(index=idx, status=422, error="Invalid employee id"))
+    deleted = await run_in_threadpool(employee_service.delete_employees, [i for _, i in valid])
+    results.extend(batch_result(idx, result, 200) for (idx, _), result in zip(valid, deleted))
+    return sorted(results, key=lambda r: r.index)
+
+
+@router.get("/employees/{employee_id}", response_model=Employee, response_class=FastJSONResponse)
 def get_employee(employee_id: UUID, employee_service: EmployeeService = Depends(get_employee_service)):
     employee = employee_service.get_employee(employee_id)
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
-    return employee
+    return FastJSONResponse(employee_service.encode_employees([employee])[0])
 
-@router.post("/employees", response_model=Employee, status_code=201)
+@router.post("/employees", response_model=Employee, status_code=201, response_class=FastJSONResponse)
 def create_employee(employee: Employee, employee_service: EmployeeService = Depends(get_employee_service)):
-    for existing in employee_service.get_employees():
-        if (existing.firstName.lower() == employee.firstName.lower() and
-            existing.lastName.lower() == employee.lastName.lower() and
-            existing.age == employee.age):
-            raise HTTPException(status_code=400, detail="Employee with these details already exists")
-    
-    return employee_service.create_employee(employee)
-
-@router.put("/employees/{employee_id}", response_model=Employee)
+    try:
+        employee = employee_service.create_employee(employee)
+    except DuplicateEmployeeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(employee_service.encode_employees([employee])[0], status_code=201)
+
+@router.put("/employees/{employee_id}", response_model=Employee, response_class=FastJSONResponse)
 def update_employee(
     employee_id: UUID,
     firstName: str = Form(...),
@@ -37,10 +156,13 @@ def update_employee(
     age: int = Form(...),
     employee_service: EmployeeService = Depends(get_employee_service)
 ):
-    employee = employee_service.update_employee(employee_id, firstName, lastName, age)
+    try:
+        employee = employee_service.update_employee(employee_id, firstName, lastName, age)
+    except DuplicateEmployeeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
-    return employee
+    return FastJSONResponse(employee_service.encode_employees([employee])[0])
 
 @router.delete("/employees/{employee_id}", status_code=200)
 def delete_employee(employee_id: UUID, employee_service: EmployeeService = Depends(get_employee_service)):
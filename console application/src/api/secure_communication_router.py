@@ -1,28 +1,119 @@
-from fastapi import APIRouter, HTTPException, Header
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Header, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from typing import Optional
 import base64
+import os
+import tempfile
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from src.services.rsa_service import RsaService
-from src.services.aes_service import AesService, AesKey
+from src.services.aes_service import AesService, AesKey, SUITE_CBC, SUITE_GCM, NONCE_SIZE
+from src.services.shared_state import open_state, limits_from_env
+from src.services.rsa_key_pool import key_pool
+from src.services.server_key_ring import ServerKeyRing
+from src.services.crypto_executor import crypto_executor, CryptoBusyError
+from src.services.session_tickets import TicketIssuer, derive_session_key
+from src.services.metrics import registry
 
 router = APIRouter(prefix="/api/secure")
 
-# Глобальне сховище для RSA ключів та AES сесій
-rsa_keys_store = {}
-aes_sessions_store = {}
-rsa_id_counter = 1
+# Ключі сервера та AES сесії у сховищах, спільних для всіх воркерів (див. APP_STATE_URL).
+# Сховище сесій обмежене за часом і розміром
+server_key_ring = ServerKeyRing.from_env(lambda **limits: open_state("server_rsa_keys", **limits))
+aes_sessions_store = open_state("aes_sessions", **limits_from_env(
+    "AES_SESSIONS", idle_ttl=1800, max_lifetime=86400, max_entries=100_000
+))
+
+
+class SessionContexts:
+    """
+    Живі AesKey сесій цього воркера за session_id (LRU до max_entries).
+    Сховище сесій з бекендом sqlite віддає на кожен get нову копію з pickle; тут між запитами
+    тримається той самий контекст, тож nonce лишаються лічильником, а шифр не готується наново.
+    Сховище лишається джерелом істини: контекст віддається, лише якщо get знайшов ту саму сесію.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def remember(self, session_id: str, aes_key: AesKey):
+        with self.lock:
+            self.entries[session_id] = aes_key
+            self.entries.move_to_end(session_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def resolve(self, session_id: str, stored: Optional[AesKey]) -> Optional[AesKey]:
+        """Живий контекст для сесії, яку повернуло сховище (None - сесії немає або вона прострочена)."""
+        if stored is None:
+            with self.lock:
+                self.entries.pop(session_id, None)
+            return None
+        with self.lock:
+            live = self.entries.get(session_id)
+            if live is not None and (live.key, live.iv, live.cipher_suite) == (stored.key, stored.iv, stored.cipher_suite):
+                self.entries.move_to_end(session_id)
+                return live
+        # Контексту немає (сесію створив інший воркер або його витіснено): копія з випадковими nonce
+        self.remember(session_id, stored)
+        return stored
+
+
+session_contexts = SessionContexts(max_entries=10_000)
+
+
+def load_session(session_id: str) -> Optional[AesKey]:
+    return session_contexts.resolve(session_id, aes_sessions_store.get(session_id))
+
+
+# Ключі квитків сесій (див. /resume-session)
+ticket_issuer = TicketIssuer.from_env(lambda **limits: open_state("session_ticket_keys", **limits))
+
+# Розміри сховищ і пулів для /metrics; читаються лише під час збирання метрик
+registry.gauge_callback("secure_sessions", "AES sessions in the session store", lambda: len(aes_sessions_store))
+registry.gauge_callback(
+    "server_rsa_keys_loaded", "Server RSA keys parsed in this worker", lambda: len(server_key_ring.stats()["loaded"])
+)
+registry.gauge_callback("rsa_key_pool_depth", "Pre-generated RSA key pairs ready to serve", lambda: key_pool.stats()["depth"])
+registry.gauge_callback(
+    "rsa_key_cache_entries", "Parsed RSA keys cached by PEM fingerprint", lambda: rsa_service.key_cache.stats()["size"]
+)
+registry.gauge_callback(
+    "crypto_executor_pending", "Crypto jobs queued or running", lambda: crypto_executor.stats()["pending"]
+)
 
 
 class SessionRequest(BaseModel):
     session_id: str
     encrypted_aes_key: str
     encrypted_iv: str
+    # Старі клієнти не передають поле і продовжують працювати з AES-CBC
+    cipher_suite: str = SUITE_CBC
 
 
 class SessionResponse(BaseModel):
     success: bool
     message: str
+    cipher_suite: str = SUITE_CBC
+    # Квиток для /resume-session: наступне підключення обійдеться без RSA
+    ticket: Optional[str] = None
+    ticket_lifetime: Optional[int] = None
+
+
+class ResumeRequest(BaseModel):
+    session_id: str
+    ticket: str
+    client_nonce: str
+
+
+class ResumeResponse(SessionResponse):
+    server_nonce: str
 
 
 class EncryptedMessage(BaseModel):
@@ -36,25 +127,117 @@ class MessageResponse(BaseModel):
 rsa_service = RsaService()
 aes_service = AesService()
 
+# Сервер шифрує відповіді з цим бітом напрямку в nonce (AES-GCM)
+SERVER_NONCE_DIRECTION = 0x80
+
+
+# Сирий шифротекст у тілі без base64 і JSON
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+
+def is_binary(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith(BINARY_MEDIA_TYPE)
+
+
+async def read_model(request: Request, model):
+    """Розбирає JSON-тіло в model так само, як це зробив би FastAPI (422 на невалідні дані)."""
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+def body_schema(model) -> dict:
+    """Опис тіла для OpenAPI: JSON-модель або сирі байти."""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema()},
+        BINARY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+    }}}
+
+
+def message_aad(direction: str, session_id: str) -> bytes:
+    """Прив'язує GCM-повідомлення до сесії та напрямку, щоб відповідь не можна було відіслати назад як запит."""
+    return f"{direction}:{session_id}".encode("utf-8")
+
+
+# Потоковий режим: тіло - послідовність записів [4 байти довжини][nonce + шифротекст + тег].
+# Останній запис порожній, це захищає від обрізання потоку
+STREAM_RECORD_SIZE = 64 * 1024
+STREAM_FRAME_OVERHEAD = NONCE_SIZE + 16
+# Зашифрована відповідь тримається в пам'яті до цього розміру, далі - у тимчасовому файлі
+STREAM_SPOOL_SIZE = 1024 * 1024
+# Найбільший розмір тіла потокового запиту (записи разом із заголовками); більше - 413
+STREAM_MAX_SIZE = int(os.environ.get("SECURE_STREAM_MAX_SIZE", str(256 * 1024 * 1024)))
+
+
+def stream_aad(direction: str, session_id: str, index: int, final: bool) -> bytes:
+    """Крім сесії та напрямку, фіксує номер запису і ознаку останнього, щоб записи не можна було переставити чи відкинути."""
+    return f"{direction}:{session_id}:{index}:{int(final)}".encode("utf-8")
+
+
+def frame(record: bytes) -> bytes:
+    return len(record).to_bytes(4, "big") + record
+
+
+async def read_frames(request: Request):
+    """Віддає записи з тіла запиту по мірі надходження; у буфері не більше одного запису."""
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        while len(buffer) >= 4:
+            size = int.from_bytes(buffer[:4], "big")
+            if size > STREAM_RECORD_SIZE + STREAM_FRAME_OVERHEAD:
+                raise HTTPException(status_code=413, detail=f"Stream records are limited to {STREAM_RECORD_SIZE} bytes")
+            if len(buffer) < 4 + size:
+                break
+            record = bytes(buffer[4:4 + size])
+            del buffer[:4 + size]
+            yield record
+    if buffer:
+        raise HTTPException(status_code=400, detail="Truncated stream record")
+
+
+async def run_crypto(fn, *args):
+    """Виконує fn у пулі crypto_executor; якщо черга заповнена, відповідає 503 з Retry-After."""
+    try:
+        return await crypto_executor.run(fn, *args)
+    except CryptoBusyError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(crypto_executor.retry_after)}
+        )
+
 
 @router.post("/generate-rsa-keys")
-def generate_server_rsa_keys():
-    """Генерує пару RSA ключів на сервері"""
-    global rsa_id_counter
-    
-    keys = rsa_service.generate_crypto_keys()
-    key_id = rsa_id_counter
-    rsa_keys_store[key_id] = keys
-    rsa_id_counter += 1
-    
+async def generate_server_rsa_keys():
+    """
+    Видає поточний публічний ключ сервера та його id. Нова пара генерується лише раз на період ротації,
+    тож рукостискання коштує одне розшифрування RSA замість генерації ключа.
+    """
+    def work():
+        key_id, keys = server_key_ring.current()
+
+        return {
+            "id": key_id,
+            "public_key": base64.b64encode(keys.public_key.encode("utf-8")).decode("utf-8"),
+            "valid_until": server_key_ring.valid_until(key_id)
+        }
+
+    return await run_crypto(work)
+
+
+@router.get("/crypto-stats")
+def get_crypto_stats():
     return {
-        "id": key_id,
-        "public_key": base64.b64encode(keys.public_key.encode("utf-8")).decode("utf-8")
+        "key_pool": key_pool.stats(),
+        "key_cache": rsa_service.key_cache.stats(),
+        "executor": crypto_executor.stats(),
+        "server_keys": server_key_ring.stats(),
+        "aes_sessions_store": aes_sessions_store.stats(),
     }
 
 
 @router.post("/establish-session", response_model=SessionResponse)
-def establish_session(
+async def establish_session(
     session_data: SessionRequest,
     x_rsa_id: int = Header(...)
 ):
@@ -62,57 +245,190 @@ def establish_session(
     Приймає зашифровані AES ключ та IV від клієнта,
     розшифровує їх та зберігає сесію
     """
-    if x_rsa_id not in rsa_keys_store:
-        raise HTTPException(status_code=404, detail="RSA keys not found")
-    
-    rsa_keys = rsa_keys_store[x_rsa_id]
-    
-    try:
-        aes_key_str = rsa_service.decrypt(
-            rsa_keys.private_key,
-            session_data.encrypted_aes_key
-        )
-        iv_str = rsa_service.decrypt(
-            rsa_keys.private_key,
-            session_data.encrypted_iv
+    def work():
+        rsa_keys = server_key_ring.get(x_rsa_id)
+        if rsa_keys is None:
+            raise HTTPException(status_code=404, detail="RSA keys not found or expired")
+
+        try:
+            aes_key_str = rsa_service.decrypt(
+                rsa_keys,
+                session_data.encrypted_aes_key
+            )
+            iv_str = rsa_service.decrypt(
+                rsa_keys,
+                session_data.encrypted_iv
+            )
+
+            aes_key = AesKey(
+                key=aes_key_str,
+                iv=iv_str,
+                cipher_suite=session_data.cipher_suite,
+                nonce_direction=SERVER_NONCE_DIRECTION
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to establish session: {str(e)}")
+
+        # add, а не set: повторний session_id не підмінює ключ уже існуючої сесії
+        if not aes_sessions_store.add(session_data.session_id, aes_key):
+            raise HTTPException(status_code=409, detail="Session already exists")
+        session_contexts.remember(session_data.session_id, aes_key)
+
+        return SessionResponse(
+            success=True,
+            message="Session established successfully",
+            cipher_suite=session_data.cipher_suite,
+            ticket=ticket_issuer.issue(aes_key),
+            ticket_lifetime=ticket_issuer.lifetime
         )
-        
-        aes_sessions_store[session_data.session_id] = AesKey(
-            key=aes_key_str,
-            iv=iv_str
+
+    return await run_crypto(work)
+
+
+@router.post("/resume-session", response_model=ResumeResponse)
+async def resume_session(session_data: ResumeRequest):
+    """
+    Відновлює сесію за квитком з establish-session без RSA: ключ нової сесії виводиться HKDF
+    із секрету квитка та nonce обох сторін, тож клієнт отримує його без жодної операції з приватним ключем.
+    """
+    def work():
+        try:
+            secret, cipher_suite = ticket_issuer.open(session_data.ticket)
+            client_nonce = base64.b64decode(session_data.client_nonce)
+        except ValueError as e:
+            raise HTTPException(status_code=401, detail=str(e))
+        if len(client_nonce) < 16:
+            raise HTTPException(status_code=400, detail="client_nonce must be at least 16 bytes")
+
+        server_nonce = os.urandom(16)
+        key, iv = derive_session_key(secret, client_nonce, server_nonce, session_data.session_id)
+        aes_key = AesKey(
+            key=base64.b64encode(key).decode("utf-8"),
+            iv=base64.b64encode(iv).decode("utf-8"),
+            cipher_suite=cipher_suite,
+            nonce_direction=SERVER_NONCE_DIRECTION
         )
-        
-        return SessionResponse(
+        # add, а не set: квиток не дозволяє підмінити ключ уже існуючої сесії
+        if not aes_sessions_store.add(session_data.session_id, aes_key):
+            raise HTTPException(status_code=409, detail="Session already exists")
+        session_contexts.remember(session_data.session_id, aes_key)
+
+        return ResumeResponse(
             success=True,
-            message="Session established successfully"
+            message="Session resumed successfully",
+            cipher_suite=cipher_suite,
+            ticket=ticket_issuer.issue(aes_key),
+            ticket_lifetime=ticket_issuer.lifetime,
+            server_nonce=base64.b64encode(server_nonce).decode("utf-8")
         )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to establish session: {str(e)}")
+
+    return await run_crypto(work)
 
 
-@router.post("/send-message", response_model=MessageResponse)
-def receive_encrypted_message(
-    message: EncryptedMessage,
+@router.post("/send-message", response_model=MessageResponse, openapi_extra=body_schema(EncryptedMessage))
+async def receive_encrypted_message(
+    request: Request,
     x_session_id: str = Header(...)
 ):
     """
     Приймає зашифроване повідомлення від клієнта,
-    розшифровує його, додає timestamp та відправляє назад зашифрованим
+    розшифровує його, додає timestamp та відправляє назад зашифрованим.
+    З Content-Type: application/octet-stream тіло і відповідь - сирий шифротекст без base64.
     """
-    if x_session_id not in aes_sessions_store:
+    binary = is_binary(request)
+    if binary:
+        cipher_bytes = await request.body()
+    else:
+        message = await read_model(request, EncryptedMessage)
+
+    def work():
+        aes_key = load_session(x_session_id)
+        if aes_key is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        try:
+            payload = cipher_bytes if binary else base64.b64decode(message.cipher_text)
+            decrypted_message = aes_service.decrypt_bytes(aes_key, payload, message_aad("c2s", x_session_id))
+            if not binary:
+                # JSON-клієнти отримують відповідь рядком, тож повідомлення має бути валідним UTF-8
+                decrypted_message.decode("utf-8")
+
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            modified_message = f"[Received at {current_time}] ".encode("utf-8") + decrypted_message
+
+            encrypted_response = aes_service.encrypt_bytes(
+                aes_key, modified_message, message_aad("s2c", x_session_id)
+            )
+
+            if binary:
+                return Response(content=encrypted_response, media_type=BINARY_MEDIA_TYPE)
+            return MessageResponse(cipher_text=base64.b64encode(encrypted_response).decode("utf-8"))
+
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to process message: {str(e)}")
+
+    return await run_crypto(work)
+
+
+@router.post("/send-message/stream")
+async def receive_encrypted_stream(
+    request: Request,
+    x_session_id: str = Header(...)
+):
+    """
+    Потокова версія send-message для великих повідомлень (лише для сесій AES-256-GCM).
+    Кожен запис запиту розшифровується по мірі надходження і одразу знову шифрується як запис відповіді,
+    тож у SpooledTemporaryFile (а за STREAM_SPOOL_SIZE - на диск) потрапляє лише шифротекст.
+    Тіло більше за STREAM_MAX_SIZE відхиляється з 413.
+    """
+    aes_key = await run_in_threadpool(load_session, x_session_id)
+    if aes_key is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    aes_key = aes_sessions_store[x_session_id]
-    
+    if aes_key.cipher_suite != SUITE_GCM:
+        raise HTTPException(status_code=400, detail="Streaming requires an AES-256-GCM session")
+
+    def seal(index: int, data: bytes, final: bool) -> bytes:
+        return frame(aes_service.encrypt_bytes(aes_key, data, stream_aad("s2c", x_session_id, index, final)))
+
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_SIZE)
+
+    def reseal_record(record: bytes, index: int) -> bool:
+        """Розшифровує запис запиту index і пише в spool запис відповіді index + 1 (нульовий - префікс)."""
+        final = len(record) == STREAM_FRAME_OVERHEAD
+        try:
+            plain = aes_service.decrypt_bytes(aes_key, record, stream_aad("c2s", x_session_id, index, final))
+        except Exception:
+            raise HTTPException(status_code=400, detail=f"Failed to decrypt stream record {index}")
+        spool.write(seal(index + 1, plain, final))
+        return final
+
     try:
-        decrypted_message = aes_service.decrypt(aes_key, message.cipher_text)
-        
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        modified_message = f"[Received at {current_time}] {decrypted_message}"
-        
-        encrypted_response = aes_service.encrypt(aes_key, modified_message)
-        
-        return MessageResponse(cipher_text=encrypted_response)
-    
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to process message: {str(e)}")
\ No newline at end of file
+        index, finished, received = 0, False, 0
+        async for record in read_frames(request):
+            if finished:
+                raise HTTPException(status_code=400, detail="Data after the final stream record")
+            received += 4 + len(record)
+            if received > STREAM_MAX_SIZE:
+                raise HTTPException(status_code=413, detail=f"Stream is limited to {STREAM_MAX_SIZE} bytes")
+            finished = await run_crypto(reseal_record, record, index)
+            index += 1
+        if not finished:
+            raise HTTPException(status_code=400, detail="Stream ended without the final record")
+    except BaseException:
+        spool.close()
+        raise
+
+    def generate():
+        try:
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            yield seal(0, f"[Received at {current_time}] ".encode("utf-8"), False)
+            spool.seek(0)
+            while True:
+                chunk = spool.read(STREAM_RECORD_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            spool.close()
+
+    return StreamingResponse(generate(), media_type=BINARY_MEDIA_TYPE)
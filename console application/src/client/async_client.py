@@ -0,0 +1,116 @@
+import asyncio
+import httpx
+from typing import AsyncIterable, AsyncIterator, Iterable, List, Optional, Union
+from src.client.client import SecureClientBase, Session, StreamDecoder, StreamEncoder, SUITE_GCM, STREAM_RECORD_SIZE
+
+
+class AsyncSecureClient(SecureClientBase):
+    """
+    Асинхронний варіант SecureClient на httpx.AsyncClient. Шифрування і розбір відповідей спільні
+    з синхронним клієнтом (SecureClientBase), а всі мережеві методи - корутини; замість close і with -
+    aclose і async with. Кілька send_encrypted_message однієї сесії можна виконувати одночасно
+    (nonce береться з лічильника, тож паралельні повідомлення не перетинаються).
+    """
+
+    def __init__(self, server_url: str = "http://localhost:8002", cipher_suite: str = SUITE_GCM, binary: bool = False,
+                 ticket_path: Optional[str] = None, http: Optional[httpx.AsyncClient] = None,
+                 max_connections: int = 100, verbose: bool = False):
+        if http is None:
+            http = httpx.AsyncClient(limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ))
+        super().__init__(server_url, cipher_suite, binary, ticket_path, http=http, verbose=verbose)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def get_server_public_key(self) -> tuple[int, str]:
+        """Отримує публічний ключ з серверу"""
+        self.log(f"\n[CLIENT] Запит публічного ключа з серверу: {self.server_url}...")
+        response = await self.http.post(f"{self.server_url}/api/secure/generate-rsa-keys")
+        return self.read_public_key(response)
+
+    async def establish_session(self, rsa_id: int, public_key_b64: str, aes_key) -> str:
+        """Встановлює безпечну сесію з сервером"""
+        session_id, payload, headers = self.session_request(rsa_id, public_key_b64, aes_key)
+        response = await self.http.post(f"{self.server_url}/api/secure/establish-session", json=payload, headers=headers)
+        self.read_session(response, aes_key)
+        return session_id
+
+    async def resume_session(self) -> Session:
+        """Відновлює сесію за збереженим квитком"""
+        ticket, session_id, client_nonce, payload = self.resume_request()
+        response = await self.http.post(f"{self.server_url}/api/secure/resume-session", json=payload)
+        return self.read_resume(response, ticket, session_id, client_nonce)
+
+    async def connect(self) -> Session:
+        """Відновлює сесію за квитком, якщо він є, інакше проходить повне рукостискання з RSA"""
+        if self.ticket is not None:
+            try:
+                self.current_session = await self.resume_session()
+                return self.current_session
+            except Exception as e:
+                self.log(f"[CLIENT] Квиток не підійшов ({e}), повне встановлення сесії...")
+
+        rsa_id, public_key_b64 = await self.get_server_public_key()
+        aes_key = self.generate_aes_key()
+        session_id = await self.establish_session(rsa_id, public_key_b64, aes_key)
+
+        self.current_session = Session(session_id=session_id, aes_key=aes_key, rsa_id=rsa_id)
+        return self.current_session
+
+    async def send_encrypted_message(self, message: str) -> str:
+        """Відправляє зашифроване повідомлення на сервер"""
+        session, body, headers = self.message_request(message)
+        url = f"{self.server_url}/api/secure/send-message"
+        if self.binary:
+            response = await self.http.post(url, content=body, headers=headers)
+        else:
+            response = await self.http.post(url, json=body, headers=headers)
+        return self.read_message(response, session)
+
+    async def send_many(self, messages: Iterable[str]) -> List[str]:
+        """Надсилає всі повідомлення одночасно в межах поточної сесії; відповіді - в порядку повідомлень."""
+        return list(await asyncio.gather(*(self.send_encrypted_message(message) for message in messages)))
+
+    async def send_encrypted_stream(self, chunks: Union[Iterable[bytes], AsyncIterable[bytes]]) -> AsyncIterator[bytes]:
+        """Потоково шифрує і надсилає дані на /send-message/stream, віддає розшифровану відповідь частинами."""
+        session = self.stream_session()
+
+        async def frames():
+            encoder = StreamEncoder(self, session)
+            if hasattr(chunks, "__aiter__"):
+                async for chunk in chunks:
+                    for frame in encoder.feed(chunk):
+                        yield frame
+            else:
+                for chunk in chunks:
+                    for frame in encoder.feed(chunk):
+                        yield frame
+            yield encoder.finish()
+
+        request = self.http.build_request(
+            "POST",
+            f"{self.server_url}/api/secure/send-message/stream",
+            content=frames(),
+            headers={"x-session-id": session.session_id, "content-type": "application/octet-stream"}
+        )
+        response = await self.http.send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise Exception(f"Failed to send stream: {response.text}")
+
+            decoder = StreamDecoder(self, session)
+            async for data in response.aiter_bytes(STREAM_RECORD_SIZE):
+                for part in decoder.feed(data):
+                    yield part
+            decoder.close()
+        finally:
+            await response.aclose()
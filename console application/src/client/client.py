@@ -1,39 +1,153 @@
 import requests
+from requests.adapters import HTTPAdapter
 import base64
+import itertools
+import json
 import os
+import time
 import uuid
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import padding as sym_padding
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.backends import default_backend
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+SUITE_CBC = "AES-256-CBC"
+SUITE_GCM = "AES-256-GCM"
+NONCE_SIZE = 12
+# Потоковий режим: записи [4 байти довжини][nonce + шифротекст + тег], останній запис порожній
+STREAM_RECORD_SIZE = 64 * 1024
+STREAM_FRAME_OVERHEAD = NONCE_SIZE + 16
 
 
 @dataclass
 class AesKey:
     key: str
     iv: str
+    cipher_suite: str = SUITE_CBC
+    # Для GCM: 8 випадкових байтів (старший біт 0 позначає напрямок клієнт -> сервер) + лічильник
+    nonce_prefix: bytes = field(
+        default_factory=lambda: bytes([os.urandom(1)[0] & 0x7F]) + os.urandom(NONCE_SIZE - 5), repr=False
+    )
+    nonce_counter: Any = field(default_factory=itertools.count, repr=False)
+
+    def next_nonce(self) -> bytes:
+        return self.nonce_prefix + next(self.nonce_counter).to_bytes(4, "big")
 
 
 @dataclass
 class Session:
     session_id: str
     aes_key: AesKey
-    rsa_id: int
+    rsa_id: Optional[int]
+
+
+@dataclass
+class SessionTicket:
+    """Квиток сервера і секрет відновлення, з яким з нього виводиться ключ нової сесії."""
+    ticket: str
+    secret: str
+    cipher_suite: str
+    expires: float
+
+
+def hkdf(secret: bytes, salt: bytes, info: bytes, length: int) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(secret)
 
 
-class SecureClient:
-    def __init__(self, server_url: str = "http://localhost:8002"):
+def stream_aad(direction: str, session_id: str, index: int, final: bool) -> bytes:
+    return f"{direction}:{session_id}:{index}:{int(final)}".encode("utf-8")
+
+
+class StreamEncoder:
+    """Шифрує дані записами до STREAM_RECORD_SIZE байтів; останній запис (finish) порожній."""
+    
+    def __init__(self, client: "SecureClientBase", session: Session):
+        self.client = client
+        self.session = session
+        self.index = 0
+    
+    def _frame(self, data: bytes, final: bool) -> bytes:
+        record = self.client.encrypt_aes_bytes(
+            self.session.aes_key, data, stream_aad("c2s", self.session.session_id, self.index, final)
+        )
+        self.index += 1
+        return len(record).to_bytes(4, "big") + record
+    
+    def feed(self, chunk: bytes) -> List[bytes]:
+        return [self._frame(chunk[start:start + STREAM_RECORD_SIZE], False)
+                for start in range(0, len(chunk), STREAM_RECORD_SIZE)]
+    
+    def finish(self) -> bytes:
+        return self._frame(b"", True)
+
+
+class StreamDecoder:
+    """Збирає записи потокової відповіді з довільних шматків тіла і розшифровує їх по порядку."""
+    
+    def __init__(self, client: "SecureClientBase", session: Session):
+        self.client = client
+        self.session = session
+        self.buffer = bytearray()
+        self.index = 0
+        self.finished = False
+    
+    def feed(self, data: bytes) -> List[bytes]:
+        self.buffer += data
+        parts = []
+        while len(self.buffer) >= 4:
+            size = int.from_bytes(self.buffer[:4], "big")
+            if len(self.buffer) < 4 + size:
+                break
+            record = bytes(self.buffer[4:4 + size])
+            del self.buffer[:4 + size]
+            if self.finished:
+                raise Exception("Data after the final stream record")
+            self.finished = size == STREAM_FRAME_OVERHEAD
+            plain = self.client.decrypt_aes_bytes(
+                self.session.aes_key, record, stream_aad("s2c", self.session.session_id, self.index, self.finished)
+            )
+            self.index += 1
+            if plain:
+                parts.append(plain)
+        return parts
+    
+    def close(self):
+        if not self.finished or self.buffer:
+            raise Exception("Response stream was truncated")
+
+
+class SecureClientBase:
+    """
+    Спільна частина синхронного і асинхронного клієнтів без жодного мережевого виклику:
+    побудова запитів, розбір відповідей, шифрування і квитки сесій.
+    Підкласи додають лише транспорт: SecureClient (requests) і AsyncSecureClient (httpx, async_client.py).
+    """
+    
+    def __init__(self, server_url: str = "http://localhost:8002", cipher_suite: str = SUITE_GCM, binary: bool = False,
+                 ticket_path: Optional[str] = None, http: Any = None, verbose: bool = True):
         self.server_url = server_url
+        # Файл для квитка сесії між запусками; без нього квиток живе лише в пам'яті
+        self.ticket_path = ticket_path
+        self.ticket: Optional[SessionTicket] = self.load_ticket()
+        # Бажаний режим; якщо сервер його не підтримує, сесія працює в AES-CBC
+        self.cipher_suite = cipher_suite
+        # Надсилати повідомлення як application/octet-stream замість base64 у JSON
+        self.binary = binary
+        # HTTP-клієнт підкласу (requests.Session або httpx.AsyncClient) з пулом з'єднань
+        self.http = http
+        self.verbose = verbose
         self.current_session: Optional[Session] = None
     
-    def get_server_public_key(self) -> tuple[int, str]:
-        """Отримує публічний ключ з серверу"""
-        print(f"\n[CLIENT] Запит публічного ключа з серверу: {self.server_url}...")
-        response = requests.post(f"{self.server_url}/api/secure/generate-rsa-keys")
-        
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+    
+    def read_public_key(self, response) -> tuple[int, str]:
         if response.status_code != 200:
             raise Exception(f"Failed to get public key: {response.text}")
         
@@ -41,12 +155,12 @@ class SecureClient:
         rsa_id = data["id"]
         public_key_b64 = data["public_key"]
         
-        print(f"[CLIENT] Отримано публічний ключ (RSA ID: {rsa_id})")
+        self.log(f"[CLIENT] Отримано публічний ключ (RSA ID: {rsa_id})")
         return rsa_id, public_key_b64
     
     def generate_aes_key(self) -> AesKey:
         """Генерує таємний ключ та IV для AES"""
-        print("[CLIENT] Генерація таємного ключа та вектора ініціалізації...")
+        self.log("[CLIENT] Генерація таємного ключа та вектора ініціалізації...")
         key = os.urandom(32)
         iv = os.urandom(16)  
         
@@ -54,7 +168,7 @@ class SecureClient:
             key=base64.b64encode(key).decode("utf-8"),
             iv=base64.b64encode(iv).decode("utf-8")
         )
-        print("[CLIENT] Таємний ключ згенеровано")
+        self.log("[CLIENT] Таємний ключ згенеровано")
         return aes_key
     
     def encrypt_with_rsa(self, public_key_b64: str, plain_text: str) -> str:
@@ -72,97 +186,293 @@ class SecureClient:
         )
         return base64.b64encode(cipher_text).decode("utf-8")
     
-    def establish_session(self, rsa_id: int, public_key_b64: str, aes_key: AesKey) -> str:
-        """Встановлює безпечну сесію з сервером"""
+    def session_request(self, rsa_id: int, public_key_b64: str, aes_key: AesKey) -> Tuple[str, dict, dict]:
         session_id = str(uuid.uuid4())
-        print(f"\n[CLIENT] Створення сесії (Session ID: {session_id})...")
+        self.log(f"\n[CLIENT] Створення сесії (Session ID: {session_id})...")
         
-        print("[CLIENT] Шифрування таємного ключа публічним ключем RSA...")
+        self.log("[CLIENT] Шифрування таємного ключа публічним ключем RSA...")
         encrypted_key = self.encrypt_with_rsa(public_key_b64, aes_key.key)
         encrypted_iv = self.encrypt_with_rsa(public_key_b64, aes_key.iv)
         
-        print("[CLIENT] Відправка зашифрованих даних на сервер...")
-        response = requests.post(
-            f"{self.server_url}/api/secure/establish-session",
-            json={
-                "session_id": session_id,
-                "encrypted_aes_key": encrypted_key,
-                "encrypted_iv": encrypted_iv
-            },
-            headers={
-                "x-rsa-id": str(rsa_id)
-            }
+        self.log("[CLIENT] Відправка зашифрованих даних на сервер...")
+        payload = {
+            "session_id": session_id,
+            "encrypted_aes_key": encrypted_key,
+            "encrypted_iv": encrypted_iv,
+            "cipher_suite": self.cipher_suite
+        }
+        return session_id, payload, {"x-rsa-id": str(rsa_id)}
+    
+    def read_session(self, response, aes_key: AesKey):
+        if response.status_code != 200:
+            raise Exception(f"Failed to establish session: {response.text}")
+        
+        result = response.json()
+        # Старий сервер не знає про cipher_suite і завжди працює в AES-CBC
+        aes_key.cipher_suite = result.get("cipher_suite", SUITE_CBC)
+        self.log(f"[CLIENT] ✓ {result['message']} ({aes_key.cipher_suite})")
+        self.remember_ticket(result, aes_key)
+    
+    def load_ticket(self) -> Optional[SessionTicket]:
+        if not self.ticket_path or not os.path.exists(self.ticket_path):
+            return None
+        try:
+            with open(self.ticket_path, encoding="utf-8") as f:
+                return SessionTicket(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+    
+    def remember_ticket(self, result: dict, aes_key: AesKey):
+        """Зберігає квиток з відповіді сервера разом із секретом, виведеним з ключа цієї сесії."""
+        if not result.get("ticket"):
+            return
+        secret = hkdf(base64.b64decode(aes_key.key), b"", b"secure-session resumption", 32)
+        self.ticket = SessionTicket(
+            ticket=result["ticket"],
+            secret=base64.b64encode(secret).decode("utf-8"),
+            cipher_suite=aes_key.cipher_suite,
+            expires=time.time() + result.get("ticket_lifetime", 0)
         )
+        if self.ticket_path:
+            # Секрет відновлення дає доступ до наступних сесій, тому файл доступний лише власнику
+            fd = os.open(self.ticket_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.ticket.__dict__, f)
+    
+    def resume_request(self) -> Tuple[SessionTicket, str, bytes, dict]:
+        ticket = self.ticket
+        if ticket is None or ticket.expires <= time.time():
+            raise Exception("No valid session ticket")
         
+        session_id = str(uuid.uuid4())
+        client_nonce = os.urandom(16)
+        self.log(f"\n[CLIENT] Відновлення сесії за квитком (Session ID: {session_id})...")
+        payload = {
+            "session_id": session_id,
+            "ticket": ticket.ticket,
+            "client_nonce": base64.b64encode(client_nonce).decode("utf-8")
+        }
+        return ticket, session_id, client_nonce, payload
+    
+    def read_resume(self, response, ticket: SessionTicket, session_id: str, client_nonce: bytes) -> Session:
         if response.status_code != 200:
-            raise Exception(f"Failed to establish session: {response.text}")
+            self.ticket = None
+            raise Exception(f"Failed to resume session: {response.text}")
         
         result = response.json()
-        print(f"[CLIENT] ✓ {result['message']}")
+        material = hkdf(
+            base64.b64decode(ticket.secret),
+            client_nonce + base64.b64decode(result["server_nonce"]),
+            b"secure-session key:" + session_id.encode("utf-8"),
+            48
+        )
+        aes_key = AesKey(
+            key=base64.b64encode(material[:32]).decode("utf-8"),
+            iv=base64.b64encode(material[32:]).decode("utf-8"),
+            cipher_suite=result.get("cipher_suite", ticket.cipher_suite)
+        )
+        self.log(f"[CLIENT] ✓ {result['message']} ({aes_key.cipher_suite})")
+        self.remember_ticket(result, aes_key)
         
-        return session_id
+        return Session(session_id=session_id, aes_key=aes_key, rsa_id=None)
     
-    def encrypt_aes(self, aes_key: AesKey, plain_text: str) -> str:
-        """Шифрує повідомлення за допомогою AES"""
+    def encrypt_aes_bytes(self, aes_key: AesKey, data: bytes, aad: bytes = b"") -> bytes:
+        """Шифрує байти за допомогою AES"""
         key = base64.b64decode(aes_key.key)
         iv = base64.b64decode(aes_key.iv)
         
+        if aes_key.cipher_suite == SUITE_GCM:
+            nonce = aes_key.next_nonce()
+            return nonce + AESGCM(key).encrypt(nonce, data, aad)
+        
         padder = sym_padding.PKCS7(128).padder()
-        padded_data = padder.update(plain_text.encode("utf-8")) + padder.finalize()
+        padded_data = padder.update(data) + padder.finalize()
         
         cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
         encryptor = cipher.encryptor()
-        ct = encryptor.update(padded_data) + encryptor.finalize()
-        
-        return base64.b64encode(ct).decode("utf-8")
+        return encryptor.update(padded_data) + encryptor.finalize()
     
-    def decrypt_aes(self, aes_key: AesKey, cipher_text: str) -> str:
-        """Розшифровує повідомлення за допомогою AES"""
+    def decrypt_aes_bytes(self, aes_key: AesKey, ct: bytes, aad: bytes = b"") -> bytes:
+        """Розшифровує байти за допомогою AES"""
         key = base64.b64decode(aes_key.key)
         iv = base64.b64decode(aes_key.iv)
-        ct = base64.b64decode(cipher_text)
+        
+        if aes_key.cipher_suite == SUITE_GCM:
+            view = memoryview(ct)
+            return AESGCM(key).decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], aad)
         
         cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
         decryptor = cipher.decryptor()
         padded_plain = decryptor.update(ct) + decryptor.finalize()
         
         unpadder = sym_padding.PKCS7(128).unpadder()
-        plain = unpadder.update(padded_plain) + unpadder.finalize()
-        
+        return unpadder.update(padded_plain) + unpadder.finalize()
+    
+    def encrypt_aes(self, aes_key: AesKey, plain_text: str, aad: bytes = b"") -> str:
+        """Шифрує повідомлення за допомогою AES"""
+        ct = self.encrypt_aes_bytes(aes_key, plain_text.encode("utf-8"), aad)
+        return base64.b64encode(ct).decode("utf-8")
+    
+    def decrypt_aes(self, aes_key: AesKey, cipher_text: str, aad: bytes = b"") -> str:
+        """Розшифровує повідомлення за допомогою AES"""
+        plain = self.decrypt_aes_bytes(aes_key, base64.b64decode(cipher_text), aad)
         return plain.decode("utf-8")
     
-    def send_encrypted_message(self, message: str):
-        """Відправляє зашифроване повідомлення на сервер"""
-        if not self.current_session:
+    def message_request(self, message: str) -> Tuple[Session, Any, dict]:
+        """(сесія, тіло, заголовки): тіло - сирі байти в бінарному режимі або JSON-об'єкт"""
+        session = self.current_session
+        if not session:
             raise Exception("No active session. Please establish a session first.")
         
-        print(f"\n[CLIENT] Шифрування повідомлення таємним ключем...")
-        encrypted_message = self.encrypt_aes(self.current_session.aes_key, message)
-        
-        print(f"[CLIENT] Відправка зашифрованого повідомлення на сервер...")
-        response = requests.post(
-            f"{self.server_url}/api/secure/send-message",
-            json={
-                "cipher_text": encrypted_message
-            },
-            headers={
-                "x-session-id": self.current_session.session_id
-            }
+        self.log(f"\n[CLIENT] Шифрування повідомлення таємним ключем...")
+        encrypted_message = self.encrypt_aes_bytes(
+            session.aes_key, message.encode("utf-8"), f"c2s:{session.session_id}".encode("utf-8")
         )
         
+        self.log(f"[CLIENT] Відправка зашифрованого повідомлення на сервер...")
+        if self.binary:
+            # Сирий шифротекст без base64 і JSON
+            headers = {"x-session-id": session.session_id, "content-type": "application/octet-stream"}
+            return session, encrypted_message, headers
+        body = {"cipher_text": base64.b64encode(encrypted_message).decode("utf-8")}
+        return session, body, {"x-session-id": session.session_id}
+    
+    def read_message(self, response, session: Session) -> str:
         if response.status_code != 200:
             raise Exception(f"Failed to send message: {response.text}")
         
-        result = response.json()
-        encrypted_response = result["cipher_text"]
+        if self.binary:
+            encrypted_response = response.content
+        else:
+            encrypted_response = base64.b64decode(response.json()["cipher_text"])
+        
+        self.log(f"[CLIENT] Отримано відповідь від серверу, дешифрування...")
+        decrypted_response = self.decrypt_aes_bytes(
+            session.aes_key,
+            encrypted_response,
+            f"s2c:{session.session_id}".encode("utf-8")
+        )
+        
+        return decrypted_response.decode("utf-8")
+    
+    def stream_frames(self, session: Session, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        encoder = StreamEncoder(self, session)
+        for chunk in chunks:
+            yield from encoder.feed(chunk)
+        yield encoder.finish()
+    
+    def stream_session(self) -> Session:
+        session = self.current_session
+        if not session:
+            raise Exception("No active session. Please establish a session first.")
+        if session.aes_key.cipher_suite != SUITE_GCM:
+            raise Exception("Streaming requires an AES-256-GCM session")
+        return session
+
+
+class SecureClient(SecureClientBase):
+    """Синхронний клієнт на requests.Session."""
+    
+    def __init__(self, server_url: str = "http://localhost:8002", cipher_suite: str = SUITE_GCM, binary: bool = False,
+                 ticket_path: Optional[str] = None, http: Any = None, pool_size: int = 10, verbose: bool = True):
+        # Одна HTTP-сесія на клієнт: keep-alive і пул з'єднань замість нового TCP-з'єднання на кожен запит.
+        # Можна передати власну (наприклад, з іншими таймаутами чи адаптерами)
+        if http is None:
+            http = self.create_http_session(pool_size)
+        super().__init__(server_url, cipher_suite, binary, ticket_path, http=http, verbose=verbose)
+    
+    @staticmethod
+    def create_http_session(pool_size: int) -> requests.Session:
+        http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        http.mount("http://", adapter)
+        http.mount("https://", adapter)
+        return http
+    
+    def close(self):
+        self.http.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def get_server_public_key(self) -> tuple[int, str]:
+        """Отримує публічний ключ з серверу"""
+        self.log(f"\n[CLIENT] Запит публічного ключа з серверу: {self.server_url}...")
+        response = self.http.post(f"{self.server_url}/api/secure/generate-rsa-keys")
+        return self.read_public_key(response)
+    
+    def establish_session(self, rsa_id: int, public_key_b64: str, aes_key: AesKey) -> str:
+        """Встановлює безпечну сесію з сервером"""
+        session_id, payload, headers = self.session_request(rsa_id, public_key_b64, aes_key)
+        response = self.http.post(f"{self.server_url}/api/secure/establish-session", json=payload, headers=headers)
+        self.read_session(response, aes_key)
+        return session_id
+    
+    def resume_session(self) -> Session:
+        """Відновлює сесію за збереженим квитком: без генерації ключів RSA і без RSA-шифрування"""
+        ticket, session_id, client_nonce, payload = self.resume_request()
+        response = self.http.post(f"{self.server_url}/api/secure/resume-session", json=payload)
+        return self.read_resume(response, ticket, session_id, client_nonce)
+    
+    def connect(self) -> Session:
+        """Відновлює сесію за квитком, якщо він є, інакше проходить повне рукостискання з RSA"""
+        if self.ticket is not None:
+            try:
+                self.current_session = self.resume_session()
+                return self.current_session
+            except Exception as e:
+                self.log(f"[CLIENT] Квиток не підійшов ({e}), повне встановлення сесії...")
+        
+        rsa_id, public_key_b64 = self.get_server_public_key()
+        
+        aes_key = self.generate_aes_key()
+        
+        session_id = self.establish_session(rsa_id, public_key_b64, aes_key)
         
-        print(f"[CLIENT] Отримано відповідь від серверу, дешифрування...")
-        decrypted_response = self.decrypt_aes(
-            self.current_session.aes_key,
-            encrypted_response
+        self.current_session = Session(
+            session_id=session_id,
+            aes_key=aes_key,
+            rsa_id=rsa_id
+        )
+        return self.current_session
+    
+    def send_encrypted_message(self, message: str):
+        """Відправляє зашифроване повідомлення на сервер"""
+        session, body, headers = self.message_request(message)
+        url = f"{self.server_url}/api/secure/send-message"
+        if self.binary:
+            response = self.http.post(url, data=body, headers=headers)
+        else:
+            response = self.http.post(url, json=body, headers=headers)
+        return self.read_message(response, session)
+    
+    def send_encrypted_stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Потоково шифрує і надсилає дані (наприклад, файл частинами) на /send-message/stream
+        та віддає розшифровану відповідь частинами. Працює лише в сесії AES-256-GCM.
+        """
+        session = self.stream_session()
+        response = self.http.post(
+            f"{self.server_url}/api/secure/send-message/stream",
+            data=self.stream_frames(session, chunks),
+            headers={
+                "x-session-id": session.session_id,
+                "content-type": "application/octet-stream"
+            },
+            stream=True
         )
         
-        return decrypted_response
+        with response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to send stream: {response.text}")
+            
+            decoder = StreamDecoder(self, session)
+            for data in response.iter_content(chunk_size=STREAM_RECORD_SIZE):
+                yield from decoder.feed(data)
+            decoder.close()
     
     def start_secure_communication(self):
         """Головний метод для початку безпечної комунікації"""
@@ -171,17 +481,7 @@ class SecureClient:
         print("=" * 60)
         
         try:
-            rsa_id, public_key_b64 = self.get_server_public_key()
-            
-            aes_key = self.generate_aes_key()
-            
-            session_id = self.establish_session(rsa_id, public_key_b64, aes_key)
-            
-            self.current_session = Session(
-                session_id=session_id,
-                aes_key=aes_key,
-                rsa_id=rsa_id
-            )
+            self.connect()
             
             print("\n" + "=" * 60)
             print("    ✓ БЕЗПЕЧНИЙ КАНАЛ ВСТАНОВЛЕНО")
@@ -216,10 +516,12 @@ class SecureClient:
             except Exception as e:
                 print(f"\n❌ Помилка при відправці повідомлення: {e}")
 
-
 def main():
-    client = SecureClient(server_url="http://localhost:8002")
-    client.start_secure_communication()
+    with SecureClient(
+        server_url="http://localhost:8002",
+        ticket_path=os.path.join(os.path.expanduser("~"), ".secure_client_ticket.json")
+    ) as client:
+        client.start_secure_communication()
 
 
 if __name__ == "__main__":
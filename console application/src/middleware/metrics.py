@@ -0,0 +1,69 @@
+import time
+from fastapi import APIRouter
+from fastapi.responses import Response
+from src.services.metrics import registry, CONTENT_TYPE
+
+# Запити, що не збіглися з жодним маршрутом, рахуються разом, щоб сканування адрес не плодило серії
+UNMATCHED_ROUTE = "<unmatched>"
+
+request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency until the last byte of the response", ("method", "route")
+)
+requests_total = registry.counter("http_requests_total", "HTTP requests by status code", ("method", "route", "status"))
+request_errors = registry.counter(
+    "http_request_errors_total", "HTTP requests that ended with 5xx or an unhandled exception", ("method", "route")
+)
+in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being processed", ("method",))
+
+
+def route_label(scope) -> str:
+    # Шаблон маршруту (/employees/{employee_id}), а не сам шлях; маршрутизатор кладе його в scope
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: час обробки кожного запиту до останнього байта відповіді, кількість запитів
+    за статусом і помилки за маршрутом. Працює напряму з ASGI, тож не буферизує потокові відповіді.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight.add(1, method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            route = route_label(scope)
+            request_seconds.labels(method, route).since(start)
+            in_flight.add(-1, method)
+            requests_total.inc(method, route, str(status))
+            if status >= 500:
+                request_errors.inc(method, route)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
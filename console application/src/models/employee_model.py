@@ -1,8 +1,16 @@
 from pydantic import BaseModel, Field
 from uuid import uuid4, UUID
+from typing import Optional
 
 class Employee(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     firstName: str
     lastName: str
     age: int
+
+
+class EmployeeUpdate(BaseModel):
+    id: UUID
+    firstName: Optional[str] = None
+    lastName: Optional[str] = None
+    age: Optional[int] = None
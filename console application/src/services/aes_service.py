@@ -1,47 +1,131 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Any
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives import padding as sym_padding
-from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
+import itertools
 import os
+import time
+from src.services.metrics import crypto_timer
+
+BLOCK_SIZE = 16
+NONCE_SIZE = 12
+# Лічильник займає останні 4 байти nonce, тож сесія може надіслати до 2^32 повідомлень
+MAX_NONCE_COUNTER = 2 ** 32
+
+SUITE_CBC = "AES-256-CBC"
+SUITE_GCM = "AES-256-GCM"
+CIPHER_SUITES = (SUITE_CBC, SUITE_GCM)
 
 @dataclass
 class AesKey:
-    key: str  
-    iv: str  
+    key: str
+    iv: str
+    cipher_suite: str = SUITE_CBC
+    # Старший біт першого байта nonce розділяє напрямки, щоб сервер і клієнт ніколи не збіглись
+    # у nonce під одним ключем: 0x80 для повідомлень сервера, 0x00 для клієнта
+    nonce_direction: int = 0
+    # Сирі байти і готовий Cipher готуються один раз на сесію, а не на кожне повідомлення
+    key_bytes: bytes = field(default=None, repr=False, compare=False)
+    iv_bytes: bytes = field(default=None, repr=False, compare=False)
+    cipher: Any = field(default=None, repr=False, compare=False)
+    nonce_prefix: bytes = field(default=None, repr=False, compare=False)
+    nonce_counter: Any = field(default=None, repr=False, compare=False)
+    # Лічильник гарантує унікальність nonce лише в межах одного живого контексту. Копія з pickle
+    # (сховище сесій віддає нову на кожен get) почала б його з нуля, тож у ній nonce випадковий: 95 біт + біт напрямку
+    counter_nonces: bool = field(default=True, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.key_bytes is None:
+            self.key_bytes = base64.b64decode(self.key)
+        if self.iv_bytes is None:
+            self.iv_bytes = base64.b64decode(self.iv)
+        if self.cipher_suite == SUITE_CBC:
+            self.cipher = Cipher(algorithms.AES(self.key_bytes), modes.CBC(self.iv_bytes))
+        elif self.cipher_suite == SUITE_GCM:
+            self.cipher = AESGCM(self.key_bytes)
+            if self.counter_nonces:
+                # nonce = 8 випадкових байтів цього контексту (з бітом напрямку) + 4 байти лічильника
+                self.nonce_prefix = self.random_nonce(NONCE_SIZE - 4)
+                self.nonce_counter = itertools.count()
+        else:
+            raise ValueError(f"Unsupported cipher suite: {self.cipher_suite}")
+
+    def random_nonce(self, size: int = NONCE_SIZE) -> bytes:
+        nonce = bytearray(os.urandom(size))
+        nonce[0] = (nonce[0] & 0x7F) | self.nonce_direction
+        return bytes(nonce)
+
+    def next_nonce(self) -> bytes:
+        if not self.counter_nonces:
+            return self.random_nonce()
+        counter = next(self.nonce_counter)
+        if counter >= MAX_NONCE_COUNTER:
+            raise ValueError("Nonce space exhausted, establish a new session")
+        return self.nonce_prefix + counter.to_bytes(4, "big")
+
+    def __getstate__(self):
+        return {"key": self.key, "iv": self.iv, "cipher_suite": self.cipher_suite, "nonce_direction": self.nonce_direction}
+
+    def __setstate__(self, state):
+        self.__init__(**state, counter_nonces=False)
+
+
+def pkcs7_pad(data: bytes) -> bytes:
+    pad = BLOCK_SIZE - len(data) % BLOCK_SIZE
+    return data + bytes((pad,)) * pad
+
+
+def pkcs7_unpad(data: bytes) -> bytes:
+    pad = data[-1] if data else 0
+    if not 1 <= pad <= BLOCK_SIZE or data[-pad:] != bytes((pad,)) * pad:
+        raise ValueError("Invalid padding bytes.")
+    return data[:-pad]
+
+
+ENCRYPT_TIMER = crypto_timer("aes_encrypt")
+DECRYPT_TIMER = crypto_timer("aes_decrypt")
+
 
 class AesService:
     def generate_secret_key(self) -> AesKey:
-        key = os.urandom(32)  
+        key = os.urandom(32)
         iv = os.urandom(16)   # 128-bit IV
         return AesKey(
             key=base64.b64encode(key).decode("utf-8"),
             iv=base64.b64encode(iv).decode("utf-8")
         )
 
-    def encrypt(self, aes_key: AesKey, plain_text: str) -> str:
-        key = base64.b64decode(aes_key.key)
-        iv = base64.b64decode(aes_key.iv)
+    def encrypt_bytes(self, aes_key: AesKey, data: bytes, aad: bytes = b"") -> bytes:
+        """CBC: шифротекст з PKCS7; GCM: nonce (12 байтів) + шифротекст + тег. aad використовується лише в GCM."""
+        start = time.perf_counter()
+        if aes_key.cipher_suite == SUITE_GCM:
+            nonce = aes_key.next_nonce()
+            cipher_bytes = nonce + aes_key.cipher.encrypt(nonce, data, aad)
+        else:
+            encryptor = aes_key.cipher.encryptor()
+            cipher_bytes = encryptor.update(pkcs7_pad(data)) + encryptor.finalize()
+        ENCRYPT_TIMER.since(start)
+        return cipher_bytes
 
-        padder = sym_padding.PKCS7(128).padder()
-        padded_data = padder.update(plain_text.encode("utf-8")) + padder.finalize()
-
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        encryptor = cipher.encryptor()
-        ct = encryptor.update(padded_data) + encryptor.finalize()
+    def decrypt_bytes(self, aes_key: AesKey, cipher_bytes: bytes, aad: bytes = b"") -> bytes:
+        start = time.perf_counter()
+        if aes_key.cipher_suite == SUITE_GCM:
+            if len(cipher_bytes) < NONCE_SIZE:
+                raise ValueError("Cipher text is too short")
+            # memoryview, щоб не копіювати тіло запиту при відокремленні nonce
+            view = memoryview(cipher_bytes)
+            data = aes_key.cipher.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], aad)
+        else:
+            decryptor = aes_key.cipher.decryptor()
+            data = pkcs7_unpad(decryptor.update(cipher_bytes) + decryptor.finalize())
+        DECRYPT_TIMER.since(start)
+        return data
 
+    def encrypt(self, aes_key: AesKey, plain_text: str, aad: bytes = b"") -> str:
+        ct = self.encrypt_bytes(aes_key, plain_text.encode("utf-8"), aad)
         return base64.b64encode(ct).decode("utf-8")
 
-    def decrypt(self, aes_key: AesKey, cipher_text: str) -> str:
-        key = base64.b64decode(aes_key.key)
-        iv = base64.b64decode(aes_key.iv)
-        ct = base64.b64decode(cipher_text)
-
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        padded_plain = decryptor.update(ct) + decryptor.finalize()
-
-        unpadder = sym_padding.PKCS7(128).unpadder()
-        plain = unpadder.update(padded_plain) + unpadder.finalize()
-
+    def decrypt(self, aes_key: AesKey, cipher_text: str, aad: bytes = b"") -> str:
+        plain = self.decrypt_bytes(aes_key, base64.b64decode(cipher_text), aad)
         return plain.decode("utf-8")
@@ -1,6 +1,126 @@
-from typing import List, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+import base64
+import bisect
+import json
+import os
+import threading
+import time
 from uuid import UUID
-from src.models.employee_model import Employee
+from src.models.employee_model import Employee, EmployeeUpdate
+from src.services.employee_storage import open_storage, StorageWriteError
+
+
+SORT_KEYS = {
+    "created": lambda e, seq: seq,
+    "age": lambda e, seq: e.age,
+    "lastName": lambda e, seq: e.lastName.casefold(),
+}
+
+
+# Скільки записів індексу query_employees переглядає під lock за один виклик
+MAX_SCAN_ENTRIES = 10000
+
+
+class DuplicateEmployeeError(Exception):
+    pass
+
+
+class WriteUnit:
+    """Номер одиниці, яку _writing поставив у чергу сховища; None, якщо змін не було."""
+
+    def __init__(self):
+        self.id: Optional[int] = None
+
+
+def identity_key(firstName: str, lastName: str, age: int) -> tuple:
+    return (firstName.casefold(), lastName.casefold(), age)
+
+
+def encode_cursor(sort: str, key, seq: int, employee_id: UUID) -> str:
+    raw = json.dumps([sort, key, seq, str(employee_id)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        cursor_sort, key, seq, employee_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        employee_id = UUID(employee_id)
+    except (ValueError, TypeError, AttributeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match sort key")
+    if not isinstance(seq, int) or not isinstance(key, str if sort == "lastName" else int):
+        raise ValueError("Invalid cursor")
+    return (key, seq, employee_id)
+
+
+class SortedIndex:
+    """
+    Відсортовані записи (key, seq, id), розкладені по кошиках до 2 * BUCKET_SIZE записів
+    (як у sortedcontainers.SortedList): вставка шукає кошик через bisect по їх максимумах
+    і зсуває лише один короткий список, а не весь індекс.
+    Застарілі записи (після update/delete) не видаляються одразу, а пропускаються при скануванні
+    і прибираються пакетно, коли їх стає більше, ніж живих.
+    """
+
+    BUCKET_SIZE = 1000
+
+    def __init__(self):
+        self.buckets = []
+        # Останній (найбільший) запис кожного кошика
+        self.maxes = []
+        self.stale = 0
+
+    def __iter__(self):
+        for bucket in self.buckets:
+            yield from bucket
+
+    def rebuild(self, entries: list):
+        """Замінює вміст уже відсортованим списком записів."""
+        size = self.BUCKET_SIZE
+        self.buckets = [entries[i:i + size] for i in range(0, len(entries), size)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.stale = 0
+
+    def add(self, key, seq: int, employee_id: UUID):
+        entry = (key, seq, employee_id)
+        if not self.buckets:
+            self.buckets.append([entry])
+            self.maxes.append(entry)
+            return
+        b = min(bisect.bisect_left(self.maxes, entry), len(self.buckets) - 1)
+        bucket = self.buckets[b]
+        idx = bisect.bisect_left(bucket, entry)
+        if idx < len(bucket) and bucket[idx] == entry:
+            # Значення повернулось до старого, застарілий запис знову актуальний
+            self.stale -= 1
+            return
+        bucket.insert(idx, entry)
+        self.maxes[b] = bucket[-1]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            half = len(bucket) // 2
+            self.buckets[b:b + 1] = [bucket[:half], bucket[half:]]
+            self.maxes[b:b + 1] = [bucket[half - 1], bucket[-1]]
+
+    def scan(self, start: Optional[tuple], after: bool = False):
+        """Записи від start (або одразу після нього, якщо after) до кінця індексу."""
+        b = idx = 0
+        if start is not None:
+            find = bisect.bisect_right if after else bisect.bisect_left
+            b = find(self.maxes, start)
+            if b == len(self.buckets):
+                return
+            idx = find(self.buckets[b], start)
+        while b < len(self.buckets):
+            bucket = self.buckets[b]
+            while idx < len(bucket):
+                yield bucket[idx]
+                idx += 1
+            b += 1
+            idx = 0
+
 
 class EmployeeService:
     _instance = None
@@ -8,34 +128,376 @@ class EmployeeService:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(EmployeeService, cls).__new__(cls)
-            cls._instance.employees = []
+            # dict зберігає порядок вставки, тому GET /employees віддає записи в порядку створення
+            cls._instance.employees = {}
+            # (firstName, lastName, age) без урахування регістру -> id, для перевірки дублікатів за O(1)
+            cls._instance.identities = {}
+            # id -> порядковий номер створення, на ньому тримаються курсори
+            cls._instance.sequences = {}
+            cls._instance.next_seq = 1
+            # id останньої застосованої зміни з таблиці changes (для кількох воркерів)
+            cls._instance.last_change = 0
+            # id -> кількість власних записів, які ще не з'явились у changes; поки вони є,
+            # старіші зміни інших воркерів для цього id ігноруються (наш запис у журналі пізніший)
+            cls._instance.pending_writes = {}
+            cls._instance.indexes = {sort: SortedIndex() for sort in SORT_KEYS}
+            cls._instance.lock = threading.RLock()
+            # id -> JSON-байти запису для відповідей, LRU; запис скидається при оновленні чи видаленні
+            cls._instance.encoded = OrderedDict()
+            cls._instance.encoded_limit = int(os.environ.get("EMPLOYEES_JSON_CACHE_SIZE", "10000"))
+            # Зміни поточного виклику для сховища; _writing передає їх одним storage.write_many
+            cls._instance.writes = []
+            cls._instance.storage = open_storage()
+            cls._instance._load()
         return cls._instance
 
+    def _load(self):
+        """Відновлює стан зі сховища; індекси будуються одним сортуванням, а не вставкою по одному."""
+        self.employees.clear()
+        self.encoded.clear()
+        self.identities.clear()
+        self.sequences.clear()
+        self.pending_writes.clear()
+        # Зміни, що з'являться під час читання, буде застосовано повторно; put і delete ідемпотентні
+        self.last_change = self.storage.last_change_id()
+        for seq, data in self.storage.load():
+            employee = Employee.model_validate_json(data)
+            self.employees[employee.id] = employee
+            self.identities[identity_key(employee.firstName, employee.lastName, employee.age)] = employee.id
+            self.sequences[employee.id] = seq
+            self.next_seq = max(self.next_seq, seq + 1)
+        for sort, index in self.indexes.items():
+            key_fn = SORT_KEYS[sort]
+            index.rebuild(sorted(
+                (key_fn(e, self.sequences[employee_id]), self.sequences[employee_id], employee_id)
+                for employee_id, e in self.employees.items()
+            ))
+
+    def _catch_up(self):
+        """
+        Застосовує зміни, зроблені іншими воркерами зі спільним сховищем. Викликається під self.lock.
+        """
+        if not self.storage.shared:
+            return
+        changes = self.storage.changes_since(self.last_change)
+        if changes is None:
+            # Потрібні зміни вже видалено з журналу: дописуємо свої і перечитуємо все
+            self.storage.sync()
+            self._load()
+            return
+        for change_id, origin, op, employee_id, seq, data in changes:
+            self.last_change = change_id
+            employee_id = UUID(employee_id)
+            pending = self.pending_writes.get(employee_id, 0)
+            if origin == self.storage.origin:
+                if pending > 1:
+                    self.pending_writes[employee_id] = pending - 1
+                else:
+                    self.pending_writes.pop(employee_id, None)
+            elif pending:
+                continue
+            elif op == "put":
+                self._apply_put(seq, Employee.model_validate_json(data))
+            else:
+                self._delete(employee_id, replicated=True)
+
+    @contextmanager
+    def _writing(self):
+        """
+        lock і _catch_up для зміни стану. Записи, накопичені всередині, йдуть у сховище однією одиницею,
+        тож пакет фіксується однією транзакцією цілком. Номер одиниці потрапляє в WriteUnit для _sync.
+        """
+        unit = WriteUnit()
+        with self.lock:
+            self._catch_up()
+            try:
+                yield unit
+            finally:
+                if self.writes:
+                    writes, self.writes = self.writes, []
+                    unit.id = self.storage.write_many(writes)
+
+    def _sync(self, unit: WriteUnit):
+        """
+        Чекає, доки сховище запише unit. Якщо пакет відкинуто, пам'ять уже розійшлась з диском:
+        під lock дописується решта черги, стан перечитується зі сховища, а виклик отримує StorageWriteError.
+        """
+        try:
+            self.storage.sync(unit.id)
+        except StorageWriteError:
+            with self.lock:
+                self.storage.sync()
+                self._load()
+            raise
+
+    def _apply_put(self, seq: int, employee: Employee):
+        if employee.id in self.employees:
+            self._update(employee.id, employee.firstName, employee.lastName, employee.age, replicated=True)
+        else:
+            self._create(employee, seq=seq, replicated=True)
+
     def create_employee(self, employee: Employee) -> Employee:
-        self.employees.append(employee)
+        with self._writing() as unit:
+            self._create(employee)
+        self._sync(unit)
         return employee
 
+    def find_duplicate(self, firstName: str, lastName: str, age: int) -> Optional[Employee]:
+        with self.lock:
+            self._catch_up()
+            employee_id = self.identities.get(identity_key(firstName, lastName, age))
+            return self.employees.get(employee_id) if employee_id is not None else None
+
     def get_employees(self) -> List[Employee]:
-        return self.employees
+        with self.lock:
+            self._catch_up()
+            return list(self.employees.values())
+
+    def query_employees(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort: str = "created",
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None,
+        name_prefix: Optional[str] = None,
+        max_scan: int = MAX_SCAN_ENTRIES,
+    ) -> Tuple[List[Employee], Optional[str]]:
+        """
+        Повертає сторінку працівників і курсор наступної сторінки (None, якщо це остання).
+        Фільтр за полем сортування обмежує діапазон індексу через bisect,
+        решта фільтрів перевіряються під час сканування.
+        Під lock переглядається не більше max_scan записів індексу: якщо фільтр відсіює майже все,
+        сторінка може бути коротшою за limit (навіть порожньою), а курсор продовжить з місця зупинки.
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        key_fn = SORT_KEYS[sort]
+        prefix = name_prefix.casefold() if name_prefix else None
+
+        after = False
+        if cursor:
+            start = decode_cursor(cursor, sort)
+            after = True
+        elif sort == "age" and min_age is not None:
+            start = (min_age,)
+        elif sort == "lastName" and prefix is not None:
+            start = (prefix,)
+        else:
+            start = None
+
+        page = []
+        # Останній переглянутий запис індексу; курсор вказує на нього
+        last = None
+        scanned = 0
+        with self.lock:
+            self._catch_up()
+            for key, seq, employee_id in self.indexes[sort].scan(start, after):
+                if sort == "age" and max_age is not None and key > max_age:
+                    break
+                if sort == "lastName" and prefix is not None and not key.startswith(prefix):
+                    break
+                if scanned == max_scan:
+                    return page, encode_cursor(sort, *last)
+                scanned += 1
+                e = self.employees.get(employee_id)
+                matches = (
+                    e is not None and self.sequences[employee_id] == seq and key_fn(e, seq) == key
+                    and (min_age is None or e.age >= min_age)
+                    and (max_age is None or e.age <= max_age)
+                    and (prefix is None or e.lastName.casefold().startswith(prefix))
+                )
+                if matches:
+                    if len(page) == limit:
+                        return page, encode_cursor(sort, *last)
+                    page.append(e)
+                last = (key, seq, employee_id)
+        return page, None
+
+    def iter_pages(self, page_size: int):
+        """Обходить усіх працівників сторінками в порядку створення, не тримаючи lock між сторінками."""
+        cursor = None
+        while True:
+            page, cursor = self.query_employees(page_size, cursor=cursor)
+            if page:
+                yield page
+            if not cursor:
+                return
 
     def get_employee(self, employee_id: UUID) -> Optional[Employee]:
-        return next((e for e in self.employees if e.id == employee_id), None)
+        if self.storage.shared:
+            with self.lock:
+                self._catch_up()
+        return self.employees.get(employee_id)
+
+    def encode_employees(self, employees: List[Employee], cache: bool = True) -> List[bytes]:
+        """
+        JSON кожного запису (як model_dump_json), з кешу, якщо запис не змінювався.
+        cache=False лише читає кеш, не додаючи нових записів: так експорт усього довідника не витісняє гарячі записи.
+        Під lock, бо _update змінює Employee на місці: у кеш не потрапить напівоновлений запис.
+        """
+        with self.lock:
+            parts = []
+            for e in employees:
+                data = self.encoded.get(e.id)
+                if data is not None:
+                    self.encoded.move_to_end(e.id)
+                else:
+                    data = e.model_dump_json().encode("utf-8")
+                    # Запис, видалений після читання сторінки, не кешується: його вже ніхто не скине
+                    if cache and self.employees.get(e.id) is e:
+                        self.encoded[e.id] = data
+                        if len(self.encoded) > self.encoded_limit:
+                            self.encoded.popitem(last=False)
+                parts.append(data)
+            return parts
 
     def update_employee(self, employee_id: UUID, firstName: str, lastName: str, age: int) -> Optional[Employee]:
-        for e in self.employees:
-            if e.id == employee_id:
-                e.firstName = firstName
-                e.lastName = lastName
-                e.age = age
-                return e
-        return None
+        with self._writing() as unit:
+            e = self._update(employee_id, firstName, lastName, age)
+        self._sync(unit)
+        return e
 
     def delete_employee(self, employee_id: UUID) -> bool:
-        for idx, e in enumerate(self.employees):
-            if e.id == employee_id:
-                del self.employees[idx]
-                return True
-        return False
+        with self._writing() as unit:
+            deleted = self._delete(employee_id)
+        self._sync(unit)
+        return deleted
+
+    def create_employees(self, employees: List[Employee]) -> list:
+        """
+        Створює працівників під одним захопленням lock, тож інші запити бачать пакет цілком.
+        Для кожного елемента повертає Employee або DuplicateEmployeeError.
+        """
+        results = []
+        with self._writing() as unit:
+            for employee in employees:
+                try:
+                    results.append(self._create(employee))
+                except DuplicateEmployeeError as e:
+                    results.append(e)
+        self._sync(unit)
+        return results
+
+    def update_employees(self, updates: List[EmployeeUpdate]) -> list:
+        """Часткове оновлення пакетом: Employee, None (не знайдено) або DuplicateEmployeeError для кожного елемента."""
+        results = []
+        with self._writing() as unit:
+            for update in updates:
+                e = self.employees.get(update.id)
+                if e is None:
+                    results.append(None)
+                    continue
+                try:
+                    results.append(self._update(
+                        update.id,
+                        update.firstName if update.firstName is not None else e.firstName,
+                        update.lastName if update.lastName is not None else e.lastName,
+                        update.age if update.age is not None else e.age,
+                    ))
+                except DuplicateEmployeeError as err:
+                    results.append(err)
+        self._sync(unit)
+        return results
+
+    def delete_employees(self, employee_ids: List[UUID]) -> List[bool]:
+        with self._writing() as unit:
+            results = [self._delete(employee_id) for employee_id in employee_ids]
+        self._sync(unit)
+        return results
+
+    # Методи нижче викликаються всередині _writing і лише додають запис у self.writes;
+    # публічні методи чекають на _sync() вже після звільнення lock.
+    # replicated=True означає зміну іншого воркера: вона вже у сховищі й не перевіряється на дублікати.
+
+    def _create(self, employee: Employee, seq: Optional[int] = None, replicated: bool = False) -> Employee:
+        key = identity_key(employee.firstName, employee.lastName, employee.age)
+        if not replicated:
+            # id може прийти від клієнта: існуючий запис не можна тихо замінити, індекси лишились би від старого
+            if employee.id in self.employees:
+                raise DuplicateEmployeeError("Employee with this id already exists")
+            if key in self.identities:
+                raise DuplicateEmployeeError("Employee with these details already exists")
+        if seq is None:
+            # Мікросекунди часу створення: порядок узгоджений між воркерами, курсор розрізняє збіги за id
+            seq = max(self.next_seq, time.time_ns() // 1000)
+        self.next_seq = max(self.next_seq, seq + 1)
+        self.employees[employee.id] = employee
+        self.identities[key] = employee.id
+        self.sequences[employee.id] = seq
+        for sort, index in self.indexes.items():
+            index.add(SORT_KEYS[sort](employee, seq), seq, employee.id)
+        if not replicated:
+            self._persist_put(employee, seq)
+        return employee
+
+    def _update(
+        self, employee_id: UUID, firstName: str, lastName: str, age: int, replicated: bool = False
+    ) -> Optional[Employee]:
+        e = self.employees.get(employee_id)
+        if e is None:
+            return None
+        new_key = identity_key(firstName, lastName, age)
+        owner = self.identities.get(new_key)
+        if owner is not None and owner != employee_id and not replicated:
+            raise DuplicateEmployeeError("Employee with these details already exists")
+        seq = self.sequences[employee_id]
+        old_keys = {sort: key_fn(e, seq) for sort, key_fn in SORT_KEYS.items()}
+        self._forget_identity(e)
+        self.encoded.pop(employee_id, None)
+        e.firstName = firstName
+        e.lastName = lastName
+        e.age = age
+        self.identities[new_key] = employee_id
+        for sort, index in self.indexes.items():
+            key = SORT_KEYS[sort](e, seq)
+            if key != old_keys[sort]:
+                index.add(key, seq, employee_id)
+                self._mark_stale(sort)
+        if not replicated:
+            self._persist_put(e, seq)
+        return e
+
+    def _delete(self, employee_id: UUID, replicated: bool = False) -> bool:
+        e = self.employees.pop(employee_id, None)
+        if e is None:
+            return False
+        self.encoded.pop(employee_id, None)
+        self._forget_identity(e)
+        del self.sequences[employee_id]
+        for sort in self.indexes:
+            self._mark_stale(sort)
+        if not replicated:
+            self._track_pending(employee_id)
+            self.writes.append(("delete", str(employee_id)))
+        return True
+
+    def _persist_put(self, e: Employee, seq: int):
+        self._track_pending(e.id)
+        self.writes.append(("put", str(e.id), seq, e.model_dump_json()))
+
+    def _track_pending(self, employee_id: UUID):
+        if self.storage.shared:
+            self.pending_writes[employee_id] = self.pending_writes.get(employee_id, 0) + 1
+
+    def _forget_identity(self, e: Employee):
+        # Два воркери можуть одночасно створити однакових працівників; індекс тримає лише одного з них
+        key = identity_key(e.firstName, e.lastName, e.age)
+        if self.identities.get(key) == e.id:
+            del self.identities[key]
+
+    def _mark_stale(self, sort: str):
+        index = self.indexes[sort]
+        index.stale += 1
+        if index.stale > len(self.employees):
+            key_fn = SORT_KEYS[sort]
+            index.rebuild([
+                (key, seq, employee_id)
+                for key, seq, employee_id in index
+                if employee_id in self.employees
+                and self.sequences[employee_id] == seq
+                and key_fn(self.employees[employee_id], seq) == key
+            ])
 
 
 employee_service = EmployeeService()
@@ -0,0 +1,150 @@
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+from src.services.rsa_service import RsaService, RsaKeys, KEYGEN_TIMER
+
+logger = logging.getLogger(__name__)
+
+# Вікно, за яке рахується швидкість поповнення пулу
+REFILL_RATE_WINDOW = 60.0
+
+
+def process_context():
+    """
+    Процеси пулу запускаються з окремого однопотокового forkserver (або spawn, де його немає):
+    fork багатопотокового сервера може скопіювати в дочірній процес захоплені іншими потоками блокування.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def warm_up() -> int:
+    # Порожня задача: змушує пул запустити процеси й імпортувати модуль ще до першого запиту
+    return os.getpid()
+
+
+def generate_keys() -> Tuple[RsaKeys, float]:
+    # Виконується в дочірньому процесі, тому функція має бути на рівні модуля.
+    # Метрики дочірнього процесу до /metrics не потрапляють, тож час генерації повертається разом із ключем
+    start = time.perf_counter()
+    keys = RsaService().generate_crypto_keys()
+    return keys, time.perf_counter() - start
+
+
+class RsaKeyPool:
+    """
+    Пул заздалегідь згенерованих RSA ключів.
+    Коли ключів разом з тими, що генеруються, стає менше low_watermark, пул догенеровує їх
+    у пулі процесів до high_watermark. Якщо пул порожній, ключ генерується одразу в запиті.
+    """
+
+    def __init__(self, low_watermark: int, high_watermark: int, workers: int, timeout: float):
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.workers = workers
+        self.timeout = timeout
+        self.keys = collections.deque()
+        self.lock = threading.Lock()
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.in_flight = 0
+        self.produced = 0
+        self.served_from_pool = 0
+        self.served_inline = 0
+        self.produced_at = collections.deque()
+
+    @classmethod
+    def from_env(cls) -> "RsaKeyPool":
+        # Ключі потрібні лише для ротації ключа сервера (ServerKeyRing), тож достатньо одного-двох у запасі
+        return cls(
+            low_watermark=int(os.environ.get("RSA_KEY_POOL_LOW", "1")),
+            high_watermark=int(os.environ.get("RSA_KEY_POOL_HIGH", "2")),
+            workers=int(os.environ.get("RSA_KEY_POOL_WORKERS", "1")),
+            timeout=float(os.environ.get("RSA_KEY_POOL_TIMEOUT", "30")),
+        )
+
+    def start(self):
+        """
+        Викликається з lifespan: процеси запускаються й прогріваються до того, як сервер прийме запити.
+        Очікування обмежене timeout секундами, далі acquire() ніколи не чекає на пул, а генерує ключ сам.
+        """
+        if self.high_watermark <= 0 or self.executor is not None:
+            return
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context())
+        try:
+            for future in [executor.submit(warm_up) for _ in range(self.workers)]:
+                future.result(timeout=self.timeout)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        self.executor = executor
+        self._refill()
+
+    def shutdown(self):
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def acquire(self) -> RsaKeys:
+        """Повертає готовий ключ з пулу або, якщо пул порожній, генерує його тут же."""
+        with self.lock:
+            keys = self.keys.popleft() if self.keys else None
+            if keys is not None:
+                self.served_from_pool += 1
+            else:
+                self.served_inline += 1
+        self._refill()
+        return keys if keys is not None else RsaService().generate_crypto_keys()
+
+    def _refill(self):
+        with self.lock:
+            executor = self.executor
+            if executor is None or len(self.keys) + self.in_flight >= self.low_watermark:
+                return
+            missing = self.high_watermark - len(self.keys) - self.in_flight
+            self.in_flight += missing
+        for _ in range(missing):
+            try:
+                executor.submit(generate_keys).add_done_callback(self._on_generated)
+            except RuntimeError:
+                # Пул процесів уже зупинено
+                with self.lock:
+                    self.in_flight -= 1
+
+    def _on_generated(self, future):
+        with self.lock:
+            self.in_flight -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                logger.error("RSA key generation failed in the pool", exc_info=future.exception())
+                return
+            keys, elapsed = future.result()
+            self.keys.append(keys)
+            self.produced += 1
+            self.produced_at.append(time.monotonic())
+        KEYGEN_TIMER.observe(elapsed)
+        self._refill()
+
+    def stats(self) -> dict:
+        with self.lock:
+            now = time.monotonic()
+            while self.produced_at and now - self.produced_at[0] > REFILL_RATE_WINDOW:
+                self.produced_at.popleft()
+            return {
+                "depth": len(self.keys),
+                "in_flight": self.in_flight,
+                "low_watermark": self.low_watermark,
+                "high_watermark": self.high_watermark,
+                "produced": self.produced,
+                "served_from_pool": self.served_from_pool,
+                "served_inline": self.served_inline,
+                "refill_rate_per_sec": len(self.produced_at) / REFILL_RATE_WINDOW,
+            }
+
+
+key_pool = RsaKeyPool.from_env()
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from src.services.rsa_service import RsaKeys
+from src.services.rsa_key_pool import key_pool
+
+
+class ServerKeyRing:
+    """
+    Довгоживучі RSA ключі сервера для рукостискання замість нової пари на кожного клієнта.
+    Поточний ключ змінюється раз на rotation секунд; попередній лишається чинним ще grace секунд,
+    щоб рукостискання, що вже почались, встигли завершитись.
+    Ідентифікатор ключа - номер епохи ротації. Ключі лежать у спільному сховищі, тож усі воркери
+    видають один і той самий ключ, а add() гарантує, що на епоху буде рівно один ключ.
+    """
+
+    def __init__(self, store, rotation: int, grace: int):
+        self.store = store
+        self.rotation = rotation
+        self.grace = grace
+        # Розібрані ключі цього процесу за епохою, щоб не парсити PEM зі сховища на кожне рукостискання
+        self.keys = {}
+        self.lock = threading.Lock()
+        self.rotations = 0
+
+    @classmethod
+    def from_env(cls, store_factory) -> "ServerKeyRing":
+        rotation = int(os.environ.get("SERVER_KEY_ROTATION", "86400"))
+        grace = int(os.environ.get("SERVER_KEY_GRACE", "600"))
+        return cls(store_factory(max_lifetime=rotation + grace), rotation, grace)
+
+    def start(self):
+        """Готує поточний ключ під час запуску, щоб перший клієнт не чекав на генерацію."""
+        self.current()
+
+    def valid_until(self, key_id: int) -> float:
+        return (key_id + 1) * self.rotation + self.grace
+
+    def current(self) -> Tuple[int, RsaKeys]:
+        epoch = int(time.time() // self.rotation)
+        keys = self._load(epoch)
+        if keys is None:
+            if self.store.add(epoch, key_pool.acquire()):
+                with self.lock:
+                    self.rotations += 1
+            keys = self._load(epoch)
+        return epoch, keys
+
+    def get(self, key_id: int) -> Optional[RsaKeys]:
+        """Ключ за id, якщо він ще чинний (поточний або в межах grace після ротації)."""
+        now = time.time()
+        if key_id > now // self.rotation or now >= self.valid_until(key_id):
+            return None
+        return self._load(key_id)
+
+    def _load(self, epoch: int) -> Optional[RsaKeys]:
+        with self.lock:
+            keys = self.keys.get(epoch)
+        if keys is not None:
+            return keys
+        keys = self.store.get(epoch)
+        if keys is not None:
+            now = time.time()
+            with self.lock:
+                self.keys = {e: k for e, k in self.keys.items() if now < self.valid_until(e)}
+                self.keys[epoch] = keys
+        return keys
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "rotation": self.rotation,
+                "grace": self.grace,
+                "loaded": sorted(self.keys),
+                "rotations": self.rotations,
+            }
@@ -0,0 +1,90 @@
+import base64
+import json
+import os
+import threading
+import time
+from typing import Tuple
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from src.services.aes_service import AesKey
+
+TICKET_NONCE_SIZE = 12
+
+
+def hkdf(secret: bytes, salt: bytes, info: bytes, length: int) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(secret)
+
+
+def resumption_secret(aes_key: AesKey) -> bytes:
+    """Секрет для відновлення виводиться з ключа сесії; сам ключ сесії у квиток не потрапляє."""
+    return hkdf(aes_key.key_bytes, b"", b"secure-session resumption", 32)
+
+
+def derive_session_key(secret: bytes, client_nonce: bytes, server_nonce: bytes, session_id: str) -> Tuple[bytes, bytes]:
+    """Новий ключ AES-256 та IV для відновленої сесії: (key, iv)."""
+    material = hkdf(secret, client_nonce + server_nonce, b"secure-session key:" + session_id.encode("utf-8"), 48)
+    return material[:32], material[32:]
+
+
+class TicketIssuer:
+    """
+    Видає і перевіряє квитки сесій: AES-GCM під ключем сервера, що змінюється кожні rotation секунд.
+    Ключі квитків лежать у спільному сховищі (для всіх воркерів) під номером епохи; add() гарантує,
+    що воркери не створять різні ключі для однієї епохи. Квиток: епоха (8 байтів) | nonce | шифротекст.
+    """
+
+    def __init__(self, store, lifetime: int, rotation: int):
+        self.store = store
+        self.lifetime = lifetime
+        self.rotation = rotation
+        self.keys = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, store_factory) -> "TicketIssuer":
+        lifetime = int(os.environ.get("SESSION_TICKET_LIFETIME", "3600"))
+        rotation = int(os.environ.get("SESSION_TICKET_KEY_ROTATION", "3600"))
+        # Ключ епохи має жити, доки чинний хоч один виданий під ним квиток
+        return cls(store_factory(max_lifetime=rotation + lifetime + 60), lifetime, rotation)
+
+    def _key(self, epoch: int, create: bool):
+        with self.lock:
+            key = self.keys.get(epoch)
+        if key is not None:
+            return key
+        if create:
+            self.store.add(epoch, os.urandom(32))
+        key = self.store.get(epoch)
+        if key is not None:
+            with self.lock:
+                self.keys = {e: k for e, k in self.keys.items() if e >= epoch - 1}
+                self.keys[epoch] = key
+        return key
+
+    def issue(self, aes_key: AesKey) -> str:
+        epoch = int(time.time() // self.rotation)
+        payload = json.dumps({
+            "secret": base64.b64encode(resumption_secret(aes_key)).decode("utf-8"),
+            "suite": aes_key.cipher_suite,
+            "expires": time.time() + self.lifetime,
+        }).encode("utf-8")
+        header = epoch.to_bytes(8, "big")
+        nonce = os.urandom(TICKET_NONCE_SIZE)
+        ticket = header + nonce + AESGCM(self._key(epoch, create=True)).encrypt(nonce, payload, header)
+        return base64.urlsafe_b64encode(ticket).decode("ascii")
+
+    def open(self, ticket: str) -> Tuple[bytes, str]:
+        """Повертає (секрет відновлення, cipher_suite) або кидає ValueError для підробленого чи простроченого квитка."""
+        try:
+            blob = base64.urlsafe_b64decode(ticket)
+            header, nonce, cipher_bytes = blob[:8], blob[8:8 + TICKET_NONCE_SIZE], blob[8 + TICKET_NONCE_SIZE:]
+            key = self._key(int.from_bytes(header, "big"), create=False)
+            if key is None:
+                raise ValueError("ticket key expired")
+            payload = json.loads(AESGCM(key).decrypt(nonce, cipher_bytes, header))
+        except Exception as e:
+            raise ValueError(f"Invalid session ticket: {str(e) or type(e).__name__}")
+        if payload["expires"] < time.time():
+            raise ValueError("Session ticket expired")
+        return base64.b64decode(payload["secret"]), payload["suite"]
@@ -0,0 +1,329 @@
+import collections
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Як часто (секунд) під час запису видаляти прострочені записи повним проходом
+SWEEP_INTERVAL = 60.0
+# SqliteState оновлює last_access не частіше, ніж раз на стільки секунд, щоб читання не ставали записами
+ACCESS_RESOLUTION = 1.0
+# SqliteState витісняє записи пакетами не більше за стільки, кожен пакет - окрема коротка транзакція
+EVICT_BATCH = 500
+
+
+def limits_from_env(prefix: str, idle_ttl: Optional[float], max_lifetime: Optional[float], max_entries: Optional[int]) -> dict:
+    """Обмеження сховища з {prefix}_IDLE_TTL, {prefix}_MAX_LIFETIME, {prefix}_MAX_ENTRIES; 0 вимикає обмеження."""
+    def read(name, default, cast):
+        value = cast(os.environ.get(f"{prefix}_{name}", default or 0))
+        return value or None
+
+    return {
+        "idle_ttl": read("IDLE_TTL", idle_ttl, float),
+        "max_lifetime": read("MAX_LIFETIME", max_lifetime, float),
+        "max_entries": read("MAX_ENTRIES", max_entries, int),
+    }
+
+
+class BoundedState:
+    """
+    Спільна частина сховищ: час простою (idle_ttl), абсолютний час життя (max_lifetime),
+    максимальна кількість записів з витісненням найдавніше використаних та лічильники.
+    None вимикає відповідне обмеження. Лічильники рахуються в межах процесу.
+    """
+
+    def __init__(self, idle_ttl: Optional[float] = None, max_lifetime: Optional[float] = None,
+                 max_entries: Optional[int] = None):
+        self.idle_ttl = idle_ttl
+        self.max_lifetime = max_lifetime
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.last_sweep = 0.0
+
+    def is_expired(self, created: float, last_access: float, now: float) -> bool:
+        return (
+            (self.idle_ttl is not None and now - last_access > self.idle_ttl)
+            or (self.max_lifetime is not None and now - created > self.max_lifetime)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "idle_ttl": self.idle_ttl,
+            "max_lifetime": self.max_lifetime,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class LocalState(BoundedState):
+    """Сховище в пам'яті процесу; підходить лише для одного воркера."""
+
+    def __init__(self, namespace: str, **limits):
+        super().__init__(**limits)
+        self.namespace = namespace
+        # key -> [value, created, last_access]; порядок - від найдавніше використаного
+        self.values = collections.OrderedDict()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key: str, now: float) -> Optional[list]:
+        entry = self.values.get(key)
+        if entry is not None and self.is_expired(entry[1], entry[2], now):
+            del self.values[key]
+            self.expirations += 1
+            return None
+        return entry
+
+    def _store(self, key: str, value, now: float):
+        self.values[key] = [value, now, now]
+        self.values.move_to_end(key)
+        self._evict(now)
+
+    def _evict(self, now: float):
+        # Записи впорядковані за останнім доступом, тож прострочені за простоєм - на початку
+        while self.values and self.idle_ttl is not None:
+            entry = next(iter(self.values.values()))
+            if now - entry[2] <= self.idle_ttl:
+                break
+            self.values.popitem(last=False)
+            self.expirations += 1
+        if now - self.last_sweep > SWEEP_INTERVAL:
+            self._sweep(now)
+        while self.max_entries is not None and len(self.values) > self.max_entries:
+            self.values.popitem(last=False)
+            self.evictions += 1
+
+    def _sweep(self, now: float) -> int:
+        self.last_sweep = now
+        expired = [key for key, entry in self.values.items() if self.is_expired(entry[1], entry[2], now)]
+        for key in expired:
+            del self.values[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def sweep(self) -> int:
+        """Видаляє всі прострочені записи; повертає їх кількість."""
+        with self.lock:
+            return self._sweep(time.monotonic())
+
+    def get(self, key) -> Optional[Any]:
+        key, now = str(key), time.monotonic()
+        with self.lock:
+            entry = self._live(key, now)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry[2] = now
+            self.values.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self._store(str(key), value, time.monotonic())
+
+    def add(self, key, value) -> bool:
+        """Записує значення, лише якщо ключа ще немає; повертає, чи вдалося."""
+        key, now = str(key), time.monotonic()
+        with self.lock:
+            if self._live(key, now) is not None:
+                return False
+            self._store(key, value, now)
+            return True
+
+    def delete(self, key) -> bool:
+        with self.lock:
+            return self.values.pop(str(key), None) is not None
+
+    def incr(self, counter: str) -> int:
+        with self.lock:
+            value = self.counters.get(counter, 0) + 1
+            self.counters[counter] = value
+            return value
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return self._live(str(key), time.monotonic()) is not None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class SqliteState(BoundedState):
+    """
+    Сховище в SQLite-файлі, спільному для всіх воркерів на одному хості.
+    Значення серіалізуються pickle, лічильники змінюються атомарно в межах транзакції.
+    Час створення та останнього доступу зберігається разом із записом (time.time(), спільний для процесів).
+
+    Кількість записів перевіряється не на кожну вставку, а раз на trim_interval вставок цього процесу;
+    тоді найдавніше використані записи витісняються до max_entries - trim_interval + 1.
+    З одним процесом записів не більше max_entries, з N воркерами - до (N - 1) * trim_interval понад межу.
+    """
+
+    def __init__(self, namespace: str, path: str, **limits):
+        super().__init__(**limits)
+        self.namespace = namespace
+        self.trim_interval = max(1, min(1000, (self.max_entries or 0) // 100))
+        self.inserts = 0
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "created REAL NOT NULL DEFAULT 0, last_access REAL NOT NULL DEFAULT 0, PRIMARY KEY (namespace, key))"
+            )
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(state)")}
+            for column in ("created", "last_access"):
+                if column not in columns:
+                    # Файл зі старою схемою: записи без часу вважаються простроченими
+                    self.conn.execute(f"ALTER TABLE state ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS state_last_access ON state (namespace, last_access)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS state_created ON state (namespace, created)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                "namespace TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL, PRIMARY KEY (namespace, name))"
+            )
+
+    def _live(self, key: str, now: float) -> Optional[tuple]:
+        row = self.conn.execute(
+            "SELECT value, created, last_access FROM state WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is not None and self.is_expired(row[1], row[2], now):
+            self.conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self.expirations += 1
+            return None
+        return row
+
+    def _evict(self, now: float):
+        if now - self.last_sweep > SWEEP_INTERVAL:
+            self._sweep(now)
+        if self.max_entries is None:
+            return
+        self.inserts += 1
+        if self.inserts % self.trim_interval:
+            return
+        # До наступної перевірки цей процес додасть не більше trim_interval - 1 записів
+        target = self.max_entries - self.trim_interval + 1
+        count = self.conn.execute("SELECT COUNT(*) FROM state WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+        while count > target:
+            cur = self.conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND key IN ("
+                "SELECT key FROM state WHERE namespace = ? ORDER BY last_access LIMIT ?)",
+                (self.namespace, self.namespace, min(count - target, EVICT_BATCH)),
+            )
+            if not cur.rowcount:
+                break
+            count -= cur.rowcount
+            self.evictions += cur.rowcount
+
+    def _sweep(self, now: float) -> int:
+        self.last_sweep = now
+        removed = 0
+        if self.idle_ttl is not None:
+            removed += self.conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND last_access < ?", (self.namespace, now - self.idle_ttl)
+            ).rowcount
+        if self.max_lifetime is not None:
+            removed += self.conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND created < ?", (self.namespace, now - self.max_lifetime)
+            ).rowcount
+        self.expirations += removed
+        return removed
+
+    def sweep(self) -> int:
+        """Видаляє всі прострочені записи; повертає їх кількість."""
+        with self.lock:
+            return self._sweep(time.time())
+
+    def get(self, key) -> Optional[Any]:
+        key, now = str(key), time.time()
+        with self.lock:
+            row = self._live(key, now)
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[2] > ACCESS_RESOLUTION:
+                self.conn.execute(
+                    "UPDATE state SET last_access = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+                )
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        data, now = pickle.dumps(value), time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state (namespace, key, value, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, str(key), data, now, now)
+            )
+            self._evict(now)
+
+    def add(self, key, value) -> bool:
+        key, data, now = str(key), pickle.dumps(value), time.time()
+        with self.lock:
+            self._live(key, now)
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO state (namespace, key, value, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, data, now, now)
+            )
+            if cur.rowcount == 1:
+                self._evict(now)
+        return cur.rowcount == 1
+
+    def delete(self, key) -> bool:
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (self.namespace, str(key)))
+        return cur.rowcount == 1
+
+    def incr(self, counter: str) -> int:
+        with self.lock:
+            return self.conn.execute(
+                "INSERT INTO counters (namespace, name, value) VALUES (?, ?, 1) "
+                "ON CONFLICT (namespace, name) DO UPDATE SET value = value + 1 RETURNING value",
+                (self.namespace, counter),
+            ).fetchone()[0]
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return self._live(str(key), time.time()) is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM state WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+
+# Схема APP_STATE_URL -> фабрика (namespace, location, **limits) -> сховище.
+# Інші бекенди (наприклад, Redis) підключаються через register_backend.
+BACKENDS: Dict[str, Callable[..., Any]] = {
+    "memory": lambda namespace, location, **limits: LocalState(namespace, **limits),
+    "sqlite": lambda namespace, location, **limits: SqliteState(namespace, location, **limits),
+}
+
+
+def register_backend(scheme: str, factory: Callable[..., Any]):
+    BACKENDS[scheme] = factory
+
+
+def open_state(namespace: str, idle_ttl: Optional[float] = None, max_lifetime: Optional[float] = None,
+               max_entries: Optional[int] = None):
+    """
+    APP_STATE_URL: memory:// (за замовчуванням) або sqlite:///path/to/state.db.
+    Для запуску з --workers N потрібен спільний бекенд, інакше сесії будуть видимі лише одному воркеру.
+    idle_ttl, max_lifetime (секунди) та max_entries обмежують сховище; None - без обмеження.
+    """
+    url = os.environ.get("APP_STATE_URL", "memory://")
+    scheme, _, location = url.partition("://")
+    if scheme not in BACKENDS:
+        raise ValueError(f"Unknown state backend: {scheme}")
+    return BACKENDS[scheme](namespace, location, idle_ttl=idle_ttl, max_lifetime=max_lifetime, max_entries=max_entries)
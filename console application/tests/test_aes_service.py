@@ -0,0 +1,51 @@
+import pickle
+from src.api.secure_communication_router import SessionContexts, SERVER_NONCE_DIRECTION
+from src.services.aes_service import AesService, AesKey, SUITE_GCM
+
+
+def gcm_key() -> AesKey:
+    plain = AesService().generate_secret_key()
+    return AesKey(key=plain.key, iv=plain.iv, cipher_suite=SUITE_GCM, nonce_direction=SERVER_NONCE_DIRECTION)
+
+
+def test_live_context_counts_nonces():
+    aes_key = gcm_key()
+
+    nonces = [aes_key.next_nonce() for _ in range(3)]
+
+    assert [n[-4:] for n in nonces] == [i.to_bytes(4, "big") for i in range(3)]
+    assert len({n[:8] for n in nonces}) == 1
+
+
+def test_unpickled_context_uses_random_nonces():
+    aes_key = gcm_key()
+    aes_key.next_nonce()
+
+    copies = [pickle.loads(pickle.dumps(aes_key)) for _ in range(50)]
+    nonces = [copy.next_nonce() for copy in copies]
+
+    assert len(set(nonces)) == len(nonces)
+    assert all(n[0] & 0x80 == SERVER_NONCE_DIRECTION for n in nonces)
+    assert sum(n[-4:] == bytes(4) for n in nonces) < 5
+    service = AesService()
+    assert service.decrypt_bytes(aes_key, service.encrypt_bytes(copies[0], b"data", b"aad"), b"aad") == b"data"
+
+
+def test_session_contexts_keep_live_key_between_requests():
+    contexts = SessionContexts(max_entries=2)
+    live = gcm_key()
+    contexts.remember("s1", live)
+
+    assert contexts.resolve("s1", pickle.loads(pickle.dumps(live))) is live
+    other = gcm_key()
+    assert contexts.resolve("s1", other) is other
+    assert contexts.resolve("s1", None) is None
+    assert "s1" not in contexts.entries
+
+
+def test_session_contexts_are_bounded():
+    contexts = SessionContexts(max_entries=2)
+    for session_id in ("a", "b", "c"):
+        contexts.remember(session_id, gcm_key())
+
+    assert list(contexts.entries) == ["b", "c"]
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from src.api import employees
+from src.models.employee_model import Employee
+from src.services.employee_service import get_employee_service
+
+
+@pytest.fixture
+def http(service):
+    """TestClient без lifespan: ендпоінти працівників працюють з окремим EmployeeService з фікстури service."""
+    import main
+    main.app.dependency_overrides[get_employee_service] = lambda: service
+    yield TestClient(main.app)
+    main.app.dependency_overrides.pop(get_employee_service, None)
+
+
+def create(service, count: int) -> list:
+    return service.create_employees([Employee(firstName=f"E{i}", lastName="Lee", age=20 + i) for i in range(count)])
+
+
+async def collect(body_iterator) -> list:
+    return [chunk async for chunk in body_iterator]
+
+
+def test_export_streams_ndjson_in_chunks(http, service, monkeypatch):
+    created = create(service, 10)
+    monkeypatch.setattr(employees, "EXPORT_CHUNK_SIZE", 3)
+
+    chunks = asyncio.run(collect(employees.export_employees(service).body_iterator))
+    response = http.get("/employees/export")
+
+    assert [chunk.count(b"\n") for chunk in chunks] == [3, 3, 3, 1]
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.content == b"".join(chunks)
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [str(e.id) for e in created]
+
+
+def test_create_batch_reports_each_item_in_order(http, service):
+    existing = create(service, 1)[0]
+    items = [
+        {"firstName": "Ann", "lastName": "Lee", "age": 30},
+        {"firstName": existing.firstName, "lastName": existing.lastName, "age": existing.age},
+        {"firstName": "NoAge", "lastName": "Lee"},
+        {"firstName": "Bob", "lastName": "Ray", "age": "forty"},
+        {"firstName": "Cid", "lastName": "Ray", "age": 41},
+    ]
+
+    results = http.post("/employees/batch", json=items).json()
+
+    assert [(r["index"], r["status"]) for r in results] == [(0, 201), (1, 400), (2, 422), (3, 422), (4, 201)]
+    assert "age" in results[2]["error"]
+    assert [e.firstName for e in service.get_employees()] == [existing.firstName, "Ann", "Cid"]
+
+
+def test_update_and_delete_batches_report_each_item_in_order(http, service):
+    first, second = create(service, 2)
+    unknown = str(uuid.uuid4())
+    updates = [
+        {"id": str(first.id), "age": 99},
+        {"id": unknown, "age": 1},
+        {"id": "not-a-uuid"},
+        {"id": str(second.id), "firstName": first.firstName, "age": 99},
+    ]
+
+    updated = http.patch("/employees/batch", json=updates).json()
+    deleted = http.request("DELETE", "/employees/batch", json=[unknown, str(first.id), "bad"]).json()
+
+    assert [(r["index"], r["status"]) for r in updated] == [(0, 200), (1, 404), (2, 422), (3, 400)]
+    assert updated[0]["employee"]["age"] == 99
+    assert [(r["index"], r["status"]) for r in deleted] == [(0, 404), (1, 200), (2, 422)]
+    assert [e.id for e in service.get_employees()] == [second.id]
+
+
+def test_batch_over_max_size_is_413(http, service, monkeypatch):
+    monkeypatch.setattr(employees, "MAX_BATCH_SIZE", 3)
+    items = [{"firstName": f"E{i}", "lastName": "Lee", "age": 30} for i in range(4)]
+
+    response = http.post("/employees/batch", json=items)
+
+    assert response.status_code == 413
+    assert service.get_employees() == []
+    assert http.post("/employees/batch", json=items[:3]).status_code == 200
+
+
+def test_batch_accepts_ndjson_body(http, service):
+    lines = [json.dumps({"firstName": f"E{i}", "lastName": "Lee", "age": 30 + i}) for i in range(3)]
+    body = "\n".join(lines[:2]) + "\n\n" + lines[2] + "\n"
+
+    results = http.post("/employees/batch", content=body, headers={"content-type": "application/x-ndjson"}).json()
+
+    assert [(r["index"], r["status"]) for r in results] == [(0, 201), (1, 201), (2, 201)]
+    assert [e.firstName for e in service.get_employees()] == ["E0", "E1", "E2"]
+
+
+def test_batch_rejects_malformed_body(http, service):
+    ndjson = {"content-type": "application/x-ndjson"}
+
+    assert http.post("/employees/batch", content='{"firstName": "A"}\n{broken', headers=ndjson).status_code == 400
+    assert http.post("/employees/batch", json={"firstName": "A"}).status_code == 400
+    assert service.get_employees() == []
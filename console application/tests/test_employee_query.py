@@ -0,0 +1,78 @@
+import random
+import pytest
+from src.models.employee_model import Employee
+from src.services.employee_service import SortedIndex
+
+SORTS = {
+    "created": lambda service, e: service.sequences[e.id],
+    "age": lambda service, e: (e.age, service.sequences[e.id]),
+    "lastName": lambda service, e: (e.lastName.casefold(), service.sequences[e.id]),
+}
+
+
+def read_all(service, sort, limit, max_scan=10000, **filters):
+    """Усі сторінки підряд за курсором."""
+    result, cursor = [], None
+    while True:
+        page, cursor = service.query_employees(limit, cursor=cursor, sort=sort, max_scan=max_scan, **filters)
+        result.extend(page)
+        if not cursor:
+            return result
+
+
+def expected(service, sort, min_age=None, max_age=None, name_prefix=None):
+    return sorted(
+        (e for e in service.get_employees()
+         if (min_age is None or e.age >= min_age)
+         and (max_age is None or e.age <= max_age)
+         and (name_prefix is None or e.lastName.casefold().startswith(name_prefix.casefold()))),
+        key=lambda e: SORTS[sort](service, e),
+    )
+
+
+@pytest.fixture
+def populated(service, monkeypatch):
+    """Сервіс після випадкових create/update/delete; малі кошики індексу, щоб вони ділились."""
+    monkeypatch.setattr(SortedIndex, "BUCKET_SIZE", 4)
+    rng = random.Random(7)
+    for i in range(300):
+        last_name = rng.choice(["Lee", "lim", "Ray", "Roe"])
+        service.create_employee(Employee(firstName=f"F{i}", lastName=last_name, age=rng.randrange(20, 60)))
+    ids = [e.id for e in service.get_employees()]
+    for employee_id in rng.sample(ids, 120):
+        e = service.get_employee(employee_id)
+        service.update_employee(employee_id, e.firstName, rng.choice(["Lee", "Kim", "Roe"]), rng.randrange(20, 60))
+    for employee_id in rng.sample(ids, 80):
+        service.delete_employee(employee_id)
+    return service
+
+
+@pytest.mark.parametrize("sort", list(SORTS))
+@pytest.mark.parametrize("filters", [{}, {"min_age": 30, "max_age": 40}, {"name_prefix": "l"}])
+def test_cursor_pages_match_full_sort(populated, sort, filters):
+    assert read_all(populated, sort, 7, **filters) == expected(populated, sort, **filters)
+
+
+def test_index_buckets_stay_sorted_and_bounded(populated):
+    for index in populated.indexes.values():
+        entries = list(index)
+        assert entries == sorted(entries)
+        assert index.maxes == [bucket[-1] for bucket in index.buckets]
+        assert all(0 < len(bucket) <= 2 * SortedIndex.BUCKET_SIZE for bucket in index.buckets)
+
+
+def test_scan_budget_returns_short_page_with_cursor(populated):
+    page, cursor = populated.query_employees(50, sort="created", name_prefix="Roe", max_scan=10)
+
+    assert len(page) < 50
+    assert cursor is not None
+    assert read_all(populated, "created", 50, max_scan=10, name_prefix="Roe") == expected(
+        populated, "created", name_prefix="Roe"
+    )
+
+
+def test_cursor_of_other_sort_is_rejected(populated):
+    _, cursor = populated.query_employees(5, sort="age")
+
+    with pytest.raises(ValueError):
+        populated.query_employees(5, cursor=cursor, sort="created")
@@ -0,0 +1,126 @@
+import random
+import pytest
+from src.models.employee_model import Employee, EmployeeUpdate
+from src.services.employee_service import DuplicateEmployeeError, SORT_KEYS, identity_key
+
+
+def assert_consistent(service):
+    """Індекс дублікатів, індекси сортування і кеш JSON відповідають самим записам."""
+    employees, sequences = service.employees, service.sequences
+    assert set(sequences) == set(employees)
+    assert service.identities == {identity_key(e.firstName, e.lastName, e.age): e.id for e in employees.values()}
+    for sort, index in service.indexes.items():
+        key_fn = SORT_KEYS[sort]
+        live = {
+            (key, seq, employee_id) for key, seq, employee_id in index
+            if employee_id in employees and sequences[employee_id] == seq and key_fn(employees[employee_id], seq) == key
+        }
+        assert live == {(key_fn(e, sequences[e.id]), sequences[e.id], e.id) for e in employees.values()}
+        assert index.stale <= len(employees) + 1
+    for employee_id, data in service.encoded.items():
+        assert data == employees[employee_id].model_dump_json().encode("utf-8")
+
+
+def test_random_changes_keep_indexes_and_cache_consistent(service):
+    rng = random.Random(3)
+    names = ["Ann", "Bob", "Eve"]
+
+    def random_employee():
+        return Employee(firstName=rng.choice(names), lastName=rng.choice(names), age=rng.randrange(20, 25))
+
+    for step in range(3000):
+        ids = list(service.employees)
+        action = rng.random()
+        if action < 0.35 or not ids:
+            candidate = random_employee()
+            exists = service.find_duplicate(candidate.firstName, candidate.lastName, candidate.age) is not None
+            try:
+                service.create_employee(candidate)
+                assert not exists
+            except DuplicateEmployeeError:
+                assert exists
+        elif action < 0.6:
+            employee_id = rng.choice(ids)
+            before = service.get_employee(employee_id).model_dump()
+            target = random_employee()
+            owner = service.find_duplicate(target.firstName, target.lastName, target.age)
+            try:
+                service.update_employee(employee_id, target.firstName, target.lastName, target.age)
+                assert owner is None or owner.id == employee_id
+            except DuplicateEmployeeError:
+                assert owner.id != employee_id
+                assert service.get_employee(employee_id).model_dump() == before
+        elif action < 0.75:
+            assert service.delete_employee(rng.choice(ids))
+        elif action < 0.85:
+            service.update_employees([EmployeeUpdate(id=rng.choice(ids), age=rng.randrange(20, 25)) for _ in range(3)])
+            service.delete_employees([rng.choice(ids)])
+        else:
+            page, _ = service.query_employees(5, sort=rng.choice(list(SORT_KEYS)))
+            service.encode_employees(page)
+        if step % 100 == 0:
+            assert_consistent(service)
+    assert_consistent(service)
+
+
+def test_create_with_existing_id_is_rejected(service):
+    ann = service.create_employee(Employee(firstName="Ann", lastName="Lee", age=30))
+
+    with pytest.raises(DuplicateEmployeeError):
+        service.create_employee(Employee(id=ann.id, firstName="Bob", lastName="Ray", age=40))
+
+    assert service.get_employee(ann.id).firstName == "Ann"
+    assert service.find_duplicate("Bob", "Ray", 40) is None
+    assert identity_key("Bob", "Ray", 40) not in service.identities
+    assert [e.id for e in service.get_employees()] == [ann.id]
+
+
+def test_batch_rejects_existing_and_repeated_ids(service):
+    ann = service.create_employee(Employee(firstName="Ann", lastName="Lee", age=30))
+    bob = Employee(firstName="Bob", lastName="Ray", age=40)
+
+    results = service.create_employees([
+        Employee(id=ann.id, firstName="Eve", lastName="Kim", age=25),
+        bob,
+        Employee(id=bob.id, firstName="Tom", lastName="Fox", age=50),
+    ])
+
+    assert isinstance(results[0], DuplicateEmployeeError)
+    assert results[1] is bob
+    assert isinstance(results[2], DuplicateEmployeeError)
+    assert [e.firstName for e in service.get_employees()] == ["Ann", "Bob"]
+    page, _ = service.query_employees(10, sort="age")
+    assert [e.firstName for e in page] == ["Ann", "Bob"]
+
+
+def test_json_cache_is_bounded_lru(service):
+    service.encoded_limit = 2
+    a, b, c = (service.create_employee(Employee(firstName=n, lastName="Lee", age=30)) for n in ("A", "B", "C"))
+
+    service.encode_employees([a, b])
+    service.encode_employees([a])
+    service.encode_employees([c])
+
+    assert list(service.encoded) == [a.id, c.id]
+
+
+def test_uncached_encoding_does_not_fill_cache(service):
+    employees = [service.create_employee(Employee(firstName=f"E{i}", lastName="Lee", age=30)) for i in range(5)]
+
+    parts = service.encode_employees(employees, cache=False)
+
+    assert parts == [e.model_dump_json().encode("utf-8") for e in employees]
+    assert not service.encoded
+
+
+def test_cached_json_follows_update_and_delete(service):
+    ann = service.create_employee(Employee(firstName="Ann", lastName="Lee", age=30))
+    bob = service.create_employee(Employee(firstName="Bob", lastName="Ray", age=40))
+    service.encode_employees([ann, bob])
+
+    service.update_employee(ann.id, "Ann", "Lee", 31)
+    service.delete_employee(bob.id)
+
+    assert service.encode_employees([ann]) == [ann.model_dump_json().encode("utf-8")]
+    assert b'"age":31' in service.encoded[ann.id]
+    assert bob.id not in service.encoded
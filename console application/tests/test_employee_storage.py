@@ -0,0 +1,83 @@
+import sqlite3
+import pytest
+from src.models.employee_model import Employee
+from src.services import employee_storage
+
+
+def test_batch_is_committed_in_one_transaction(open_worker):
+    worker = open_worker()
+    commits = worker.storage.commits
+
+    created = worker.create_employees([Employee(firstName=f"E{i}", lastName="Lee", age=30) for i in range(5000)])
+
+    assert worker.storage.commits == commits + 1
+    assert [e.id for e in open_worker().get_employees()] == [e.id for e in created]
+
+
+def test_changes_replicate_between_workers(open_worker):
+    first, second = open_worker(), open_worker()
+    ann = first.create_employee(Employee(firstName="Ann", lastName="Lee", age=30))
+    bob = first.create_employee(Employee(firstName="Bob", lastName="Ray", age=40))
+
+    assert second.get_employee(ann.id).firstName == "Ann"
+    second.update_employee(ann.id, "Ann", "Lee", 35)
+    second.delete_employee(bob.id)
+
+    assert first.get_employee(ann.id).age == 35
+    assert first.get_employee(bob.id) is None
+    assert first.find_duplicate("Bob", "Ray", 40) is None
+    page, _ = first.query_employees(10, sort="age")
+    assert [(e.firstName, e.age) for e in page] == [("Ann", 35)]
+
+
+def test_reload_restores_state(open_worker):
+    worker = open_worker()
+    worker.create_employees([Employee(firstName=f"E{i}", lastName=f"L{i % 3}", age=20 + i) for i in range(10)])
+    worker.delete_employee(worker.get_employees()[0].id)
+
+    reloaded = open_worker()
+
+    assert [e.model_dump() for e in reloaded.get_employees()] == [e.model_dump() for e in worker.get_employees()]
+    page, _ = reloaded.query_employees(3, sort="lastName")
+    assert [e.lastName for e in page] == ["L0", "L0", "L0"]
+
+
+def fail_commits(monkeypatch, failures: int):
+    """Перші failures спроб writer-а завершуються помилкою, далі транзакції проходять як звичайно."""
+    monkeypatch.setattr(employee_storage, "WRITE_RETRY_DELAY", 0)
+    commit = employee_storage.SqliteStorage._commit
+    remaining = [failures]
+
+    def flaky_commit(self, conn, batch):
+        if remaining[0] > 0:
+            remaining[0] -= 1
+            raise sqlite3.OperationalError("disk I/O error")
+        return commit(self, conn, batch)
+
+    monkeypatch.setattr(employee_storage.SqliteStorage, "_commit", flaky_commit)
+
+
+def test_writer_retries_failed_commit(open_worker, monkeypatch):
+    worker = open_worker()
+    fail_commits(monkeypatch, 1)
+
+    ann = worker.create_employee(Employee(firstName="Ann", lastName="Lee", age=30))
+
+    assert worker.storage.retries == 1
+    assert open_worker().get_employee(ann.id).firstName == "Ann"
+
+
+def test_lost_batch_is_rolled_back_and_writer_keeps_running(open_worker, monkeypatch):
+    worker = open_worker()
+    ann = worker.create_employee(Employee(firstName="Ann", lastName="Lee", age=30))
+    fail_commits(monkeypatch, employee_storage.WRITE_RETRIES + 1)
+
+    with pytest.raises(employee_storage.StorageWriteError):
+        worker.create_employees([Employee(firstName="Bob", lastName="Ray", age=40)])
+
+    assert [e.id for e in worker.get_employees()] == [ann.id]
+    assert worker.find_duplicate("Bob", "Ray", 40) is None
+    assert [e.id for e in open_worker().get_employees()] == [ann.id]
+
+    worker.update_employee(ann.id, "Ann", "Lee", 35)
+    assert open_worker().get_employee(ann.id).age == 35
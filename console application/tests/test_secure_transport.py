@@ -0,0 +1,98 @@
+import os
+import pytest
+from fastapi.testclient import TestClient
+from src.api import secure_communication_router as router
+from src.client.client import SecureClient, StreamDecoder
+
+BINARY = "application/octet-stream"
+
+
+@pytest.fixture(scope="module")
+def http():
+    import main
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(http):
+    client = SecureClient(server_url="http://testserver", binary=True, http=http, verbose=False)
+    client.connect()
+    return client
+
+
+def post_stream(http, client, body: bytes):
+    headers = {"x-session-id": client.current_session.session_id, "content-type": BINARY}
+    return http.post("/api/secure/send-message/stream", content=body, headers=headers)
+
+
+def stream_records(client, data: bytes) -> list:
+    return list(client.stream_frames(client.current_session, [data]))
+
+
+def test_binary_message_round_trip(http, client):
+    session = client.current_session
+    # Довільні байти, не UTF-8: у бінарному режимі вони доходять без base64 і без перевірки кодування
+    payload = b"\xff\x00\xfe" + os.urandom(1024)
+    body = client.encrypt_aes_bytes(session.aes_key, payload, router.message_aad("c2s", session.session_id))
+
+    response = http.post(
+        "/api/secure/send-message", content=body, headers={"x-session-id": session.session_id, "content-type": BINARY}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == BINARY
+    reply = client.decrypt_aes_bytes(session.aes_key, response.content, router.message_aad("s2c", session.session_id))
+    assert reply.startswith(b"[Received at ") and reply.endswith(payload)
+    assert client.send_encrypted_message("привіт").endswith("привіт")
+
+
+def test_stream_round_trip(http, client):
+    data = os.urandom(3 * router.STREAM_RECORD_SIZE + 123)
+
+    response = post_stream(http, client, b"".join(stream_records(client, data)))
+
+    assert response.status_code == 200
+    decoder = StreamDecoder(client, client.current_session)
+    reply = b"".join(decoder.feed(response.content))
+    decoder.close()
+    assert reply.startswith(b"[Received at ") and reply.endswith(data)
+
+
+def test_tampered_stream_record_is_rejected(http, client):
+    records = stream_records(client, os.urandom(2 * router.STREAM_RECORD_SIZE))
+    tampered = bytearray(records[1])
+    tampered[-1] ^= 1
+    records[1] = bytes(tampered)
+
+    response = post_stream(http, client, b"".join(records))
+
+    assert response.status_code == 400
+    assert "record 1" in response.json()["error"]
+
+
+def test_reordered_stream_records_are_rejected(http, client):
+    records = stream_records(client, os.urandom(2 * router.STREAM_RECORD_SIZE))
+    records[0], records[1] = records[1], records[0]
+
+    assert post_stream(http, client, b"".join(records)).status_code == 400
+
+
+def test_truncated_stream_is_rejected(http, client):
+    records = stream_records(client, os.urandom(router.STREAM_RECORD_SIZE))
+
+    without_final = post_stream(http, client, b"".join(records[:-1]))
+    cut_mid_record = post_stream(http, client, b"".join(records)[:-5])
+
+    assert without_final.status_code == 400
+    assert without_final.json()["error"] == "Stream ended without the final record"
+    assert cut_mid_record.status_code == 400
+    assert cut_mid_record.json()["error"] == "Truncated stream record"
+
+
+def test_stream_over_max_size_is_413(http, client, monkeypatch):
+    monkeypatch.setattr(router, "STREAM_MAX_SIZE", 2 * router.STREAM_RECORD_SIZE)
+
+    response = post_stream(http, client, b"".join(stream_records(client, os.urandom(3 * router.STREAM_RECORD_SIZE))))
+
+    assert response.status_code == 413
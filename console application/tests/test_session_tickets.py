@@ -0,0 +1,90 @@
+import base64
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+from src.client.client import SecureClient, Session
+from src.services.aes_service import AesKey, SUITE_GCM
+from src.services.session_tickets import TicketIssuer, resumption_secret
+from src.services.shared_state import LocalState
+
+
+def session_key() -> AesKey:
+    return AesKey(
+        key=base64.b64encode(os.urandom(32)).decode("utf-8"),
+        iv=base64.b64encode(os.urandom(16)).decode("utf-8"),
+        cipher_suite=SUITE_GCM,
+    )
+
+
+@pytest.fixture
+def issuer():
+    return TicketIssuer(LocalState("session_ticket_keys"), lifetime=60, rotation=3600)
+
+
+def test_ticket_carries_resumption_secret(issuer):
+    aes_key = session_key()
+
+    secret, suite = issuer.open(issuer.issue(aes_key))
+
+    assert secret == resumption_secret(aes_key)
+    assert suite == SUITE_GCM
+
+
+def test_tampered_ticket_is_rejected(issuer):
+    blob = bytearray(base64.urlsafe_b64decode(issuer.issue(session_key())))
+    blob[-1] ^= 1
+
+    with pytest.raises(ValueError):
+        issuer.open(base64.urlsafe_b64encode(bytes(blob)).decode("ascii"))
+
+
+def test_expired_ticket_is_rejected(issuer, monkeypatch):
+    ticket = issuer.issue(session_key())
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+
+    with pytest.raises(ValueError, match="expired"):
+        issuer.open(ticket)
+
+
+def test_ticket_survives_key_rotation(issuer, monkeypatch):
+    aes_key = session_key()
+    ticket = issuer.issue(aes_key)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 30)
+    issuer.rotation = 1
+    issuer.issue(session_key())
+
+    assert issuer.open(ticket)[0] == resumption_secret(aes_key)
+
+
+def test_client_resumes_session_without_rsa():
+    import main
+    with TestClient(main.app) as http:
+        client = SecureClient(server_url="http://testserver", http=http, verbose=False)
+        first = client.connect()
+        resumed = client.connect()
+
+        assert first.rsa_id is not None
+        assert resumed.rsa_id is None
+        assert resumed.session_id != first.session_id
+        assert client.send_encrypted_message("hello").endswith("hello")
+
+
+def test_establish_does_not_replace_existing_session():
+    import main
+    with TestClient(main.app) as http:
+        client = SecureClient(server_url="http://testserver", http=http, verbose=False)
+        rsa_id, public_key = client.get_server_public_key()
+        aes_key = client.generate_aes_key()
+        session_id, payload, headers = client.session_request(rsa_id, public_key, aes_key)
+        client.read_session(http.post("/api/secure/establish-session", json=payload, headers=headers), aes_key)
+
+        _, replay, _ = client.session_request(rsa_id, public_key, client.generate_aes_key())
+        replay["session_id"] = session_id
+        response = http.post("/api/secure/establish-session", json=replay, headers=headers)
+
+        assert response.status_code == 409
+        client.current_session = Session(session_id=session_id, aes_key=aes_key, rsa_id=rsa_id)
+        assert client.send_encrypted_message("hello").endswith("hello")
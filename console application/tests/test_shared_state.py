@@ -0,0 +1,33 @@
+import time
+from src.services.shared_state import SqliteState
+
+
+def test_sqlite_state_stays_within_max_entries(tmp_path):
+    state = SqliteState("sessions", str(tmp_path / "state.db"), max_entries=1000)
+
+    for i in range(5000):
+        state.set(f"k{i}", i)
+        if i % 250 == 0:
+            assert len(state) <= 1000
+
+    assert len(state) <= 1000
+    assert state.get("k4999") == 4999
+    assert state.get("k0") is None
+    assert state.evictions == 5000 - len(state)
+
+
+def test_sqlite_state_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    state = SqliteState("sessions", str(tmp_path / "state.db"), max_entries=3)
+
+    for key in ("a", "b", "c"):
+        clock[0] += 10
+        state.set(key, key)
+    clock[0] += 10
+    state.get("a")
+    clock[0] += 10
+    state.set("d", "d")
+
+    assert state.get("b") is None
+    assert [state.get(key) for key in ("a", "c", "d")] == ["a", "c", "d"]
@@ -2,8 +2,13 @@ from fastapi import FastAPI
 from src.api import employees
 from src.middleware.error_handler import ErrorHandlerMiddleware
 from src.middleware import error_handler
+from src.middleware import metrics
+from src.middleware.metrics import MetricsMiddleware
 
 app = FastAPI()
 app.include_router(employees.router)
+app.include_router(metrics.router)
 app.add_middleware(ErrorHandlerMiddleware)
+# Додається останнім, тож охоплює і відповіді 500 від ErrorHandlerMiddleware
+app.add_middleware(MetricsMiddleware)
 error_handler.setup_exception_handlers(app)
\ No newline at end of file
@@ -0,0 +1,31 @@
+import json
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    # orjson необов'язковий: без нього відповіді кодуються стандартним json
+    orjson = None
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_array(parts) -> bytes:
+    """JSON-масив з уже закодованих елементів."""
+    return b"[" + b",".join(parts) + b"]"
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-відповідь без jsonable_encoder: bytes віддаються як готовий JSON, решта кодується orjson
+    (або json, якщо orjson не встановлено). Ендпоінт, що повертає її сам, обходить і валідацію response_model.
+    """
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -1,17 +1,41 @@
 from fastapi import HTTPException
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from src.models.employee_storage import StorageWriteError
+
+# Тіло не залежить від запиту, тож відповідь готується один раз
+INTERNAL_ERROR_RESPONSE = JSONResponse(status_code=500, content={"error": "Internal Server Error"})
+
+class ErrorHandlerMiddleware:
+    """
+    ASGI middleware: необроблений виняток перетворюється на 500 з JSON-тілом.
+    На відміну від BaseHTTPMiddleware не запускає окрему задачу й не пропускає відповідь
+    через проміжний потік, тож потокові відповіді віддаються напряму.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking_start(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
 
-class ErrorHandlerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
         try:
-            return await call_next(request)
-        except Exception as exc:
-            return JSONResponse(
-                status_code=500,
-                content={"error": "Internal Server Error"}
-            )
+            await self.app(scope, receive, send_tracking_start)
+        except Exception:
+            # Після початку відповіді статус уже не змінити: лишається обірвати з'єднання
+            if response_started:
+                raise
+            await INTERNAL_ERROR_RESPONSE(scope, receive, send)
         
 def setup_exception_handlers(app: FastAPI):
     @app.exception_handler(HTTPException)
@@ -20,4 +44,8 @@ def setup_exception_handlers(app: FastAPI):
             status_code=exc.status_code,
             content={"error": exc.detail}
         )
-        
+
+    @app.exception_handler(StorageWriteError)
+    async def storage_write_error_handler(request, exc: StorageWriteError):
+        # Зміну не записано й відкочено в пам'яті, тож запит можна безпечно повторити
+        return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "1"})
@@ -0,0 +1,190 @@
+import bisect
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, Sequence, Tuple
+
+# Межі кошиків гістограми часу запитів, секунди
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+
+class Gauge:
+    """Значення, яке можна збільшувати й зменшувати (наприклад, кількість запитів в обробці)."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, float] = {}
+        self.lock = threading.Lock()
+
+    def add(self, amount: float, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+
+class CallbackGauge:
+    """
+    Значення читається функцією під час збирання метрик (розмір сховища, глибина пулу),
+    тож коду, що змінює ці структури, нічого не треба оновлювати.
+    Функція повертає число або словник {кортеж значень міток: число}.
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable[[], object], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+
+    def collect(self) -> Iterable[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            # Недоступне сховище не повинно ламати всю сторінку метрик
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in items:
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(v)}"
+
+
+class HistogramChild:
+    """Гістограма для одного набору міток; її варто отримати один раз і тримати, а не шукати на кожен виклик."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    def since(self, start: float):
+        """Записує час, що минув від start (значення time.perf_counter())."""
+        self.observe(time.perf_counter() - start)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[tuple, HistogramChild] = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *labels) -> HistogramChild:
+        child = self.children.get(labels)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(labels, HistogramChild(self.buckets))
+        return child
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            children = list(self.children.items())
+        for labels, child in children:
+            with child.lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % format_value(bound)
+                yield f"{self.name}_bucket{format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """
+    Метрики процесу у текстовому форматі Prometheus. Під --workers N кожен воркер рахує своє,
+    а /metrics віддає лічильники того воркера, що обробив запит.
+    Повторна реєстрація з тим самим іменем повертає вже наявну метрику.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, name: str, factory):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(name, lambda: Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(name, lambda: Gauge(name, help, labelnames))
+
+    def gauge_callback(self, name: str, help: str, fn: Callable[[], object], labelnames: Sequence[str] = ()):
+        return self._register(name, lambda: CallbackGauge(name, help, fn, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = [line for metric in metrics for line in metric.collect()]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
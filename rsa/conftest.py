@@ -0,0 +1,27 @@
+import pytest
+from src.models.employee import EmployeeService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Окремий EmployeeService у пам'яті замість спільного singleton."""
+    monkeypatch.delenv("EMPLOYEES_DB_PATH", raising=False)
+    monkeypatch.setattr(EmployeeService, "_instance", None)
+    return EmployeeService()
+
+
+@pytest.fixture
+def open_worker(monkeypatch, tmp_path):
+    """Кожен виклик - новий EmployeeService (як окремий воркер) над спільним SQLite-файлом."""
+    monkeypatch.setenv("EMPLOYEES_DB_PATH", str(tmp_path / "employees.db"))
+    opened = []
+
+    def open_worker():
+        monkeypatch.setattr(EmployeeService, "_instance", None)
+        worker = EmployeeService()
+        opened.append(worker)
+        return worker
+
+    yield open_worker
+    for worker in opened:
+        worker.storage.close()
@@ -1,10 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.api import employees, crypto_keys
 from src.middleware.error_handler import ErrorHandlerMiddleware
 from src.middleware import error_handler
+from src.middleware import metrics
+from src.middleware.metrics import MetricsMiddleware
+from src.models.rsa_key_pool import key_pool
+from src.models.rsa_batch import batch_pool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    key_pool.start()
+    batch_pool.start()
+    yield
+    batch_pool.shutdown()
+    key_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(employees.router)
 app.include_router(crypto_keys.router)
+app.include_router(metrics.router)
 app.add_middleware(ErrorHandlerMiddleware)
+# Додається останнім, тож охоплює і відповіді 500 від ErrorHandlerMiddleware
+app.add_middleware(MetricsMiddleware)
 error_handler.setup_exception_handlers(app)
\ No newline at end of file
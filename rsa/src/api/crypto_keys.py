@@ -1,54 +1,163 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional, Union
 from src.models.rsa_service import RsaService, RsaKeys
+from src.models.shared_state import open_state, limits_from_env
+from src.models.rsa_key_pool import key_pool
+from src.models.crypto_executor import crypto_executor, CryptoBusyError
+from src.models.rsa_batch import batch_pool
+from src.models.metrics import registry
 import base64
 
 router = APIRouter(prefix="/api")
 rsa_service = RsaService()
 
-key_store = {} 
-id_counter = 1
+# Ключі зберігаються у спільному сховищі, щоб id були видимі всім воркерам.
+# Сховище обмежене за часом і розміром, інакше кожна згенерована пара лишалась би в ньому назавжди
+key_store = open_state("rsa_keys", **limits_from_env(
+    "RSA_KEYS", idle_ttl=3600, max_lifetime=86400, max_entries=10_000
+))
+
+
+async def run_crypto(fn, *args):
+    """Виконує fn у пулі crypto_executor; якщо черга заповнена, відповідає 503 з Retry-After."""
+    try:
+        return await crypto_executor.run(fn, *args)
+    except CryptoBusyError as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(crypto_executor.retry_after)}
+        )
+
+
+# Сирі байти в тілі без base64 і JSON; ключ тоді передається заголовком
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+
+def is_binary(request: Request) -> bool:
+    return request.headers.get("content-type", "").startswith(BINARY_MEDIA_TYPE)
+
+
+async def read_model(request: Request, model):
+    """Розбирає JSON-тіло в model так само, як це зробив би FastAPI (422 на невалідні дані)."""
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors()])
+
+
+def body_schema(model) -> dict:
+    """Опис тіла для OpenAPI: JSON-модель або сирі байти."""
+    return {"requestBody": {"required": True, "content": {
+        "application/json": {"schema": model.model_json_schema()},
+        BINARY_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+    }}}
+
+
+def resolve_key(key_id: Optional[int], key_base64: Optional[str]) -> Union[str, RsaKeys]:
+    """
+    key_id посилається на пару з key_store, де ключ уже розібраний, тож PEM не передається і не парситься знову.
+    Без key_id використовується PEM з запиту. Викликається до try у work(), щоб 404 не перетворювалась на 400.
+    """
+    if key_id is not None:
+        keys = key_store.get(key_id)
+        if keys is None:
+            raise HTTPException(status_code=404, detail="Keys not found")
+        return keys
+    if not key_base64:
+        raise HTTPException(status_code=400, detail="Either key_id or the key itself is required")
+    try:
+        return base64.b64decode(key_base64).decode("utf-8")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid key encoding: {e}")
+
+
+def header_key_id(request: Request) -> Optional[int]:
+    value = request.headers.get("x-key-id")
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise HTTPException(status_code=400, detail="X-Key-Id must be an integer")
+    return int(value)
+
 
 class GenerateKeyResponse(BaseModel):
     id: int
     public_key: str
-    private_key: str #        
+    private_key: str # у реальних застосунках цей ключ не повертається 
 
 class PublicKeyResponse(BaseModel):
     public_key: str
 
 class EncryptRequest(BaseModel):
-    public_key_base64: str
+    # Або key_id збереженої пари, або сам ключ
+    key_id: Optional[int] = None
+    public_key_base64: Optional[str] = None
     plain_text: str
+    # Конверт: RSA шифрує лише свіжий ключ AES, текст - AES-GCM, тож розмір тексту не обмежений ~190 байтами
+    envelope: bool = False
 
 class EncryptResponse(BaseModel):
     cipher_text: str
 
 class DecryptRequest(BaseModel):
-    private_key_base64: str  
+    key_id: Optional[int] = None
+    private_key_base64: Optional[str] = None
     cipher_text: str
 
 class DecryptResponse(BaseModel):
     plain_text: str
 
+# Максимальна кількість елементів в одному пакетному запиті
+MAX_BATCH_SIZE = 10000
+
+class EncryptBatchRequest(BaseModel):
+    key_id: Optional[int] = None
+    public_key_base64: Optional[str] = None
+    plain_texts: List[str]
+    envelope: bool = False
+
+class DecryptBatchRequest(BaseModel):
+    key_id: Optional[int] = None
+    private_key_base64: Optional[str] = None
+    cipher_texts: List[str]
+
+class EncryptBatchItem(BaseModel):
+    index: int
+    status: int
+    cipher_text: Optional[str] = None
+    error: Optional[str] = None
+
+class DecryptBatchItem(BaseModel):
+    index: int
+    status: int
+    plain_text: Optional[str] = None
+    error: Optional[str] = None
+
+
+def check_batch_size(items: list):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {MAX_BATCH_SIZE} items")
+
 @router.post("/generate/rsa-keys", response_model=GenerateKeyResponse)
-def generate_rsa_keys():
-    '''            
-      /  Postman.
-             .'''
-    global id_counter
-    try:
-        keys = rsa_service.generate_crypto_keys()
-        key_id = id_counter
-        key_store[key_id] = keys
-        id_counter += 1
-        return GenerateKeyResponse(
-            id=key_id,
-            public_key=keys.public_key,
-            private_key=keys.private_key
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def generate_rsa_keys():
+    ''' Цей ендпоїнт повертає приватний ключ лише з навчальною та тестовою метою 
+    для перевірки шифрування/дешифрування у Postman.
+    У реальних застосунках приватний ключ ніколи не має залишати сервер.'''
+    def work():
+        try:
+            keys = key_pool.acquire()
+            key_id = key_store.incr("id")
+            key_store.set(key_id, keys)
+            return GenerateKeyResponse(
+                id=key_id,
+                public_key=keys.public_key,
+                private_key=keys.private_key
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await run_crypto(work)
 
 @router.get("/rsa-public-key/{key_id}", response_model=PublicKeyResponse)
 def get_rsa_public_key(key_id: int):
@@ -58,20 +167,152 @@ def get_rsa_public_key(key_id: int):
     return PublicKeyResponse(public_key=base64.b64encode(keys.public_key.encode("utf-8")).decode("utf-8"))
 
 
-@router.post("/encrypt", response_model=EncryptResponse)
-def rsa_encrypt(data: EncryptRequest):
-    try:
-        public_key_pem = base64.b64decode(data.public_key_base64).decode("utf-8")
-        cipher_text = rsa_service.encrypt(public_key_pem, data.plain_text)
-        return EncryptResponse(cipher_text=cipher_text)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+@router.post("/encrypt", response_model=EncryptResponse, openapi_extra=body_schema(EncryptRequest))
+async def rsa_encrypt(request: Request):
+    """
+    З Content-Type: application/octet-stream тіло - відкритий текст, ключ - у X-Key-Id або X-Public-Key,
+    відповідь - сирий шифротекст.
+    Режим конверта вмикається полем envelope або заголовком X-Envelope: true; /decrypt розпізнає його сам.
+    """
+    if is_binary(request):
+        key_id = header_key_id(request)
+        public_key_base64 = request.headers.get("x-public-key")
+        envelope = request.headers.get("x-envelope", "").lower() in ("1", "true")
+        plain_bytes = await request.body()
 
-@router.post("/decrypt", response_model=DecryptResponse)
-def rsa_decrypt(data: DecryptRequest):
-    try:
-        private_key_pem = base64.b64decode(data.private_key_base64).decode("utf-8")
-        plain_text = rsa_service.decrypt(private_key_pem, data.cipher_text)
-        return DecryptResponse(plain_text=plain_text)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        def work():
+            public_key = resolve_key(key_id, public_key_base64)
+            try:
+                encrypt = rsa_service.encrypt_envelope if envelope else rsa_service.encrypt_bytes
+                return Response(content=encrypt(public_key, plain_bytes), media_type=BINARY_MEDIA_TYPE)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        return await run_crypto(work)
+
+    data = await read_model(request, EncryptRequest)
+
+    def work():
+        public_key = resolve_key(data.key_id, data.public_key_base64)
+        try:
+            if data.envelope:
+                blob = rsa_service.encrypt_envelope(public_key, data.plain_text.encode("utf-8"))
+                return EncryptResponse(cipher_text=base64.b64encode(blob).decode("utf-8"))
+            cipher_text = rsa_service.encrypt(public_key, data.plain_text)
+            return EncryptResponse(cipher_text=cipher_text)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await run_crypto(work)
+
+@router.post("/decrypt", response_model=DecryptResponse, openapi_extra=body_schema(DecryptRequest))
+async def rsa_decrypt(request: Request):
+    """
+    З Content-Type: application/octet-stream тіло - сирий шифротекст, ключ - у X-Key-Id або X-Private-Key,
+    відповідь - відкритий текст. З key_id приватний ключ взагалі не передається мережею.
+    """
+    if is_binary(request):
+        key_id = header_key_id(request)
+        private_key_base64 = request.headers.get("x-private-key")
+        cipher_bytes = await request.body()
+
+        def work():
+            private_key = resolve_key(key_id, private_key_base64)
+            try:
+                return Response(content=rsa_service.decrypt_bytes(private_key, cipher_bytes), media_type=BINARY_MEDIA_TYPE)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        return await run_crypto(work)
+
+    data = await read_model(request, DecryptRequest)
+
+    def work():
+        private_key = resolve_key(data.key_id, data.private_key_base64)
+        try:
+            plain_text = rsa_service.decrypt(private_key, data.cipher_text)
+            return DecryptResponse(plain_text=plain_text)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await run_crypto(work)
+
+@router.post("/encrypt/batch", response_model=List[EncryptBatchItem])
+async def rsa_encrypt_batch(data: EncryptBatchRequest):
+    """Шифрує N текстів одним ключем: ключ декодується і розбирається один раз на весь пакет."""
+    check_batch_size(data.plain_texts)
+
+    def work():
+        keys = resolve_key(data.key_id, data.public_key_base64)
+        try:
+            if not isinstance(keys, RsaKeys):
+                keys = RsaKeys(public_key=keys, private_key="")
+            rsa_service.load_public_key(keys)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid public key: {e}")
+        encrypt = rsa_service.encrypt_envelope if data.envelope else rsa_service.encrypt_bytes
+        results = []
+        for idx, plain_text in enumerate(data.plain_texts):
+            try:
+                cipher_text = base64.b64encode(encrypt(keys, plain_text.encode("utf-8"))).decode("utf-8")
+                results.append(EncryptBatchItem(index=idx, status=200, cipher_text=cipher_text))
+            except Exception as e:
+                results.append(EncryptBatchItem(index=idx, status=400, error=str(e)))
+        return results
+
+    return await run_crypto(work)
+
+@router.post("/decrypt/batch", response_model=List[DecryptBatchItem])
+async def rsa_decrypt_batch(data: DecryptBatchRequest):
+    """
+    Розшифровує N шифротекстів одним ключем. Операції з приватним ключем розподіляються
+    між процесами batch_pool, результати повертаються в порядку вхідних даних.
+    """
+    check_batch_size(data.cipher_texts)
+
+    def work():
+        private_key = resolve_key(data.key_id, data.private_key_base64)
+        # Процесам пулу передається PEM: кожен розбирає його один раз і кешує
+        private_key_pem = private_key.private_key if isinstance(private_key, RsaKeys) else private_key
+        try:
+            rsa_service.load_private_key(private_key)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid private key: {e}")
+        results, items, positions = [], [], []
+        for idx, cipher_text in enumerate(data.cipher_texts):
+            try:
+                items.append(base64.b64decode(cipher_text, validate=True))
+                positions.append(idx)
+            except Exception as e:
+                results.append(DecryptBatchItem(index=idx, status=400, error=f"Invalid base64: {e}"))
+        for idx, (ok, value) in zip(positions, batch_pool.decrypt(private_key_pem, items)):
+            try:
+                if not ok:
+                    raise ValueError(value)
+                results.append(DecryptBatchItem(index=idx, status=200, plain_text=value.decode("utf-8")))
+            except Exception as e:
+                results.append(DecryptBatchItem(index=idx, status=400, error=str(e)))
+        return sorted(results, key=lambda r: r.index)
+
+    return await run_crypto(work)
+
+@router.get("/crypto-stats")
+def get_crypto_stats():
+    return {
+        "key_pool": key_pool.stats(),
+        "key_cache": rsa_service.key_cache.stats(),
+        "executor": crypto_executor.stats(),
+        "key_store": key_store.stats(),
+        "batch_pool": batch_pool.stats(),
+    }
+
+
+# Розміри сховищ і пулів для /metrics; читаються лише під час збирання метрик
+registry.gauge_callback("rsa_key_store_entries", "RSA key pairs in the key store", lambda: len(key_store))
+registry.gauge_callback("rsa_key_pool_depth", "Pre-generated RSA key pairs ready to serve", lambda: key_pool.stats()["depth"])
+registry.gauge_callback(
+    "rsa_key_cache_entries", "Parsed RSA keys cached by PEM fingerprint", lambda: rsa_service.key_cache.stats()["size"]
+)
+registry.gauge_callback(
+    "crypto_executor_pending", "Crypto jobs queued or running", lambda: crypto_executor.stats()["pending"]
+)
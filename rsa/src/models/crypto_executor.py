@@ -0,0 +1,65 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class CryptoBusyError(Exception):
+    pass
+
+
+class CryptoExecutor:
+    """
+    Окремий пул потоків для криптографічних операцій, щоб RSA не займало спільний threadpool Starlette.
+    Черга обмежена max_pending: коли вона заповнена, run() одразу кидає CryptoBusyError.
+    """
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crypto")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "CryptoExecutor":
+        workers = int(os.environ.get("CRYPTO_WORKERS", str(os.cpu_count() or 1)))
+        return cls(
+            workers=workers,
+            max_pending=int(os.environ.get("CRYPTO_MAX_PENDING", str(workers * 16))),
+            retry_after=int(os.environ.get("CRYPTO_RETRY_AFTER", "1")),
+        )
+
+    async def run(self, fn: Callable, *args):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise CryptoBusyError("Crypto executor queue is full")
+            self.pending += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # Слот звільняється, коли задача справді завершилась, навіть якщо клієнт уже відключився
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self.lock:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "rejected": self.rejected,
+            }
+
+
+crypto_executor = CryptoExecutor.from_env()
@@ -0,0 +1,229 @@
+import atexit
+import collections
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Скільки останніх змін тримати для інших воркерів; відсталий воркер перезавантажує все
+CHANGES_RETENTION = 100_000
+
+# Скільки разів writer повторює транзакцію (щоразу з новим з'єднанням), перш ніж відкинути пакет
+WRITE_RETRIES = int(os.environ.get("EMPLOYEES_DB_WRITE_RETRIES", "3"))
+WRITE_RETRY_DELAY = 0.1
+
+
+class StorageWriteError(Exception):
+    """Зміни не вдалося записати у сховище навіть після повторів."""
+
+
+class MemoryStorage:
+    """Нічого не зберігає: дані живуть лише в пам'яті процесу (режим для тестів і за замовчуванням)."""
+
+    shared = False
+
+    def last_change_id(self) -> int:
+        return 0
+
+    def changes_since(self, change_id: int) -> Optional[List[tuple]]:
+        return []
+
+    def load(self) -> Iterator[Tuple[int, str]]:
+        return iter(())
+
+    def write_many(self, writes: List[tuple]) -> int:
+        return 0
+
+    def sync(self, unit: Optional[int] = None):
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """
+    Сховище працівників у SQLite в режимі WAL.
+    write_many лише ставить зміни в чергу; окремий потік записує все, що накопичилось,
+    однією транзакцією (group commit), тож один fsync покриває багато запитів.
+    sync() блокує, доки не буде записано все, що було в черзі на момент виклику.
+    Якщо транзакція не вдається і після повторів, пакет відкидається, а writer працює далі:
+    sync(unit) для відкинутої одиниці кидає StorageWriteError, щоб сервіс перечитав стан з диска.
+
+    Кожна операція також пишеться в таблицю changes з позначкою origin цього процесу,
+    щоб інші воркери з тим самим файлом могли підтягнути зміни через changes_since().
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = uuid.uuid4().hex
+        self.commits = 0
+        self.pending = []
+        self.enqueued = 0
+        # Номер останньої одиниці, яку writer уже обробив: записав або відкинув
+        self.processed = 0
+        # (перша, остання) одиниці відкинутих пакетів; sync перевіряє лише нещодавні
+        self.lost = collections.deque(maxlen=1000)
+        self.retries = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS employees ("
+            "id TEXT PRIMARY KEY, seq INTEGER NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS employees_seq ON employees (seq)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, op TEXT NOT NULL, "
+            "employee_id TEXT NOT NULL, seq INTEGER, data TEXT)"
+        )
+        conn.commit()
+        conn.close()
+        self.reader = self._connect()
+        self.reader_lock = threading.Lock()
+
+        self.writer = threading.Thread(target=self._run, name="employee-storage-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def load(self) -> Iterator[Tuple[int, str]]:
+        conn = self._connect()
+        try:
+            yield from conn.execute("SELECT seq, data FROM employees ORDER BY seq")
+        finally:
+            conn.close()
+
+    def last_change_id(self) -> int:
+        with self.reader_lock:
+            return self.reader.execute("SELECT COALESCE(MAX(id), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, change_id: int) -> Optional[List[tuple]]:
+        """
+        Зміни після change_id як (id, origin, op, employee_id, seq, data).
+        None означає, що частину змін уже видалено і треба перечитати сховище повністю.
+        """
+        with self.reader_lock:
+            rows = self.reader.execute(
+                "SELECT id, origin, op, employee_id, seq, data FROM changes WHERE id > ? ORDER BY id", (change_id,)
+            ).fetchall()
+        if rows and rows[0][0] > change_id + 1:
+            return None
+        return rows
+
+    def write_many(self, writes: List[tuple]) -> int:
+        """
+        Ставить у чергу зміни ("put", id, seq, data) або ("delete", id) однією одиницею:
+        writer забирає з черги лише цілі одиниці, тож вони потрапляють в одну транзакцію
+        і ні після збою, ні в changes для інших воркерів не видно половини пакета.
+        Повертає номер одиниці для sync().
+        """
+        ops = []
+        for write in writes:
+            if write[0] == "put":
+                _, employee_id, seq, data = write
+                ops.append(("INSERT OR REPLACE INTO employees (id, seq, data) VALUES (?, ?, ?)", (employee_id, seq, data)))
+                ops.append(("INSERT INTO changes (origin, op, employee_id, seq, data) VALUES (?, 'put', ?, ?, ?)",
+                            (self.origin, employee_id, seq, data)))
+            else:
+                _, employee_id = write
+                ops.append(("DELETE FROM employees WHERE id = ?", (employee_id,)))
+                ops.append(("INSERT INTO changes (origin, op, employee_id) VALUES (?, 'delete', ?)",
+                            (self.origin, employee_id)))
+        with self.cond:
+            self.pending.extend(ops)
+            self.enqueued += 1
+            self.cond.notify_all()
+            return self.enqueued
+
+    def sync(self, unit: Optional[int] = None):
+        """
+        Чекає, доки writer обробить одиницю unit (без unit - все, що вже в черзі).
+        Якщо пакет з unit відкинуто, кидає StorageWriteError.
+        """
+        with self.cond:
+            target = self.enqueued if unit is None else unit
+            while self.processed < target:
+                self.cond.wait()
+            if unit is not None and any(first <= unit <= last for first, last in self.lost):
+                raise StorageWriteError("Employee storage write failed")
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join()
+        self.reader.close()
+
+    def _run(self):
+        conn = None
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending and self.closed:
+                    break
+                batch, self.pending = self.pending, []
+                first, target = self.processed + 1, self.enqueued
+            for attempt in range(WRITE_RETRIES + 1):
+                try:
+                    if conn is None:
+                        conn = self._connect()
+                    self._commit(conn, batch)
+                    break
+                except Exception:
+                    logger.exception(
+                        "Failed to commit %d employee storage operations (attempt %d)", len(batch), attempt + 1
+                    )
+                    # З'єднання після збою може лишитись непридатним, тож наступна спроба відкриває нове
+                    if conn is not None:
+                        try:
+                            conn.close()
+                        except Exception:
+                            pass
+                        conn = None
+                    if attempt < WRITE_RETRIES:
+                        self.retries += 1
+                        time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+            else:
+                with self.cond:
+                    self.lost.append((first, target))
+            with self.cond:
+                self.processed = target
+                self.cond.notify_all()
+        if conn is not None:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[tuple]):
+        with conn:
+            for sql, params in batch:
+                conn.execute(sql, params)
+            self.commits += 1
+            if self.commits % 1000 == 0:
+                conn.execute(
+                    "DELETE FROM changes WHERE id <= (SELECT MAX(id) FROM changes) - ?", (CHANGES_RETENTION,)
+                )
+
+
+def open_storage():
+    """EMPLOYEES_DB_PATH вмикає SQLite-сховище, без нього дані тримаються лише в пам'яті."""
+    path = os.environ.get("EMPLOYEES_DB_PATH")
+    if not path:
+        return MemoryStorage()
+    return SqliteStorage(path)
@@ -0,0 +1,123 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from typing import List, Optional, Tuple, Union
+from src.models.rsa_service import RsaService, RsaKeys, OAEP_DECRYPT_TIMER
+from src.models.crypto_executor import CryptoBusyError
+from src.models.rsa_key_pool import process_context, warm_up
+
+# Менші пакети розшифровуються в поточному потоці: передача в процес коштує більше, ніж кілька операцій RSA
+BATCH_MIN_CHUNK = 16
+
+# У дочірньому процесі цей екземпляр кешує розібраний ключ, тож PEM парситься один раз на процес
+chunk_service = RsaService()
+
+ItemResult = Tuple[bool, Union[bytes, str]]
+
+
+def decrypt_chunk(private_key_pem: str, items: List[bytes]) -> Tuple[List[ItemResult], List[float]]:
+    """
+    Виконується в дочірньому процесі, тому функція має бути на рівні модуля.
+    Повертає (успіх, дані або помилка) для кожного елемента і тривалості успішних розшифрувань:
+    метрики дочірнього процесу до /metrics не потрапляють, їх записує батьківський.
+    """
+    keys = RsaKeys(public_key="", private_key=private_key_pem)
+    chunk_service.load_private_key(keys)
+    results, durations = [], []
+    for item in items:
+        start = time.perf_counter()
+        try:
+            results.append((True, chunk_service.decrypt_bytes(keys, item)))
+        except Exception as e:
+            results.append((False, str(e) or type(e).__name__))
+        else:
+            durations.append(time.perf_counter() - start)
+    return results, durations
+
+
+class RsaBatchPool:
+    """
+    Пул процесів для пакетного розшифрування: пакет ділиться на рівні частини за кількістю процесів,
+    кожна частина обробляється одним викликом decrypt_chunk, результати повертаються в порядку входу.
+    """
+
+    def __init__(self, workers: int, timeout: float):
+        self.workers = workers
+        self.timeout = timeout
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.chunks = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_env(cls) -> "RsaBatchPool":
+        return cls(
+            workers=int(os.environ.get("RSA_BATCH_WORKERS", str(os.cpu_count() or 1))),
+            timeout=float(os.environ.get("RSA_BATCH_TIMEOUT", "30")),
+        )
+
+    def start(self):
+        """Викликається з lifespan: процеси запускаються й прогріваються до того, як сервер прийме запити."""
+        if self.workers <= 1 or self.executor is not None:
+            return
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=process_context())
+        try:
+            for future in [executor.submit(warm_up) for _ in range(self.workers)]:
+                future.result(timeout=self.timeout)
+        except BaseException:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        self.executor = executor
+
+    def shutdown(self):
+        executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def decrypt(self, private_key_pem: str, items: List[bytes]) -> List[ItemResult]:
+        """Блокує до завершення всього пакета; викликається з пулу crypto_executor."""
+        executor = self.executor
+        chunk_size = max(BATCH_MIN_CHUNK, math.ceil(len(items) / max(self.workers, 1)))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        with self.lock:
+            self.batches += 1
+            self.items += len(items)
+            self.chunks += len(chunks)
+        if executor is None or len(chunks) <= 1:
+            # У цьому ж процесі oaep_decrypt уже записав час кожної операції
+            return decrypt_chunk(private_key_pem, items)[0]
+        futures = [executor.submit(decrypt_chunk, private_key_pem, chunk) for chunk in chunks]
+        # Один строк на весь пакет: запит не чекає на пул процесів довше за timeout секунд
+        deadline = time.monotonic() + self.timeout
+        results = []
+        for future in futures:
+            try:
+                chunk_results, durations = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except TimeoutError:
+                for pending in futures:
+                    pending.cancel()
+                with self.lock:
+                    self.timeouts += 1
+                raise CryptoBusyError(f"Batch decryption did not finish within {self.timeout:g}s")
+            results.extend(chunk_results)
+            for elapsed in durations:
+                OAEP_DECRYPT_TIMER.observe(elapsed)
+        return results
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "running": self.executor is not None,
+                "batches": self.batches,
+                "items": self.items,
+                "chunks": self.chunks,
+                "timeouts": self.timeouts,
+            }
+
+
+batch_pool = RsaBatchPool.from_env()
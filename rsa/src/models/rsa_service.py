@@ -1,16 +1,136 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Union
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import base64
+import hashlib
+import os
+import threading
+import time
+from src.models.metrics import crypto_timer
 
 @dataclass
 class RsaKeys:
     public_key: str
     private_key: str
+    # Розібрані об'єкти ключів, щоб не парсити PEM на кожну операцію
+    public_key_obj: Any = field(default=None, repr=False, compare=False)
+    private_key_obj: Any = field(default=None, repr=False, compare=False)
+
+    def __getstate__(self):
+        # Об'єкти cryptography не серіалізуються pickle (пул процесів, спільне сховище)
+        return {"public_key": self.public_key, "private_key": self.private_key}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+class ParsedKeyCache:
+    """LRU кеш розібраних ключів за SHA-256 відбитком PEM."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, pem: str, loader: Callable[[bytes], Any]) -> Any:
+        pem_bytes = pem.encode("utf-8")
+        fingerprint = hashlib.sha256(pem_bytes).digest()
+        with self.lock:
+            key = self.entries.get(fingerprint)
+            if key is not None:
+                self.entries.move_to_end(fingerprint)
+                self.hits += 1
+                return key
+            self.misses += 1
+        key = loader(pem_bytes)
+        with self.lock:
+            self.entries[fingerprint] = key
+            self.entries.move_to_end(fingerprint)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return key
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_size": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+OAEP_PADDING = padding.OAEP(
+    mgf=padding.MGF1(algorithm=hashes.SHA256()),
+    algorithm=hashes.SHA256(),
+    label=None
+)
+
+# Конверт (гібридне шифрування): MAGIC | довжина обгорнутого ключа (2 байти) | RSA-OAEP(ключ AES-256)
+# | nonce (12 байтів) | AES-GCM(дані) з тегом. Заголовок до nonce автентифікується як AAD.
+ENVELOPE_MAGIC = b"RSE1"
+ENVELOPE_NONCE_SIZE = 12
+ENVELOPE_TAG_SIZE = 16
+
+
+def is_envelope(cipher_bytes: bytes, private_key) -> bool:
+    """Звичайний RSA-шифротекст завжди дорівнює розміру модуля, конверт - завжди довший."""
+    return cipher_bytes[:len(ENVELOPE_MAGIC)] == ENVELOPE_MAGIC and len(cipher_bytes) != private_key.key_size // 8
+
+
+KEYGEN_TIMER = crypto_timer("rsa_keygen")
+PEM_PARSE_PRIVATE_TIMER = crypto_timer("rsa_pem_parse_private")
+PEM_PARSE_PUBLIC_TIMER = crypto_timer("rsa_pem_parse_public")
+OAEP_ENCRYPT_TIMER = crypto_timer("rsa_oaep_encrypt")
+OAEP_DECRYPT_TIMER = crypto_timer("rsa_oaep_decrypt")
+
+
+def parse_public_pem(pem: bytes):
+    start = time.perf_counter()
+    key = serialization.load_pem_public_key(pem)
+    PEM_PARSE_PUBLIC_TIMER.since(start)
+    return key
+
+
+def parse_private_pem(pem: bytes):
+    start = time.perf_counter()
+    key = serialization.load_pem_private_key(pem, password=None)
+    PEM_PARSE_PRIVATE_TIMER.since(start)
+    return key
+
+
+def oaep_encrypt(public_key, data: bytes) -> bytes:
+    start = time.perf_counter()
+    cipher_bytes = public_key.encrypt(data, OAEP_PADDING)
+    OAEP_ENCRYPT_TIMER.since(start)
+    return cipher_bytes
+
+
+def oaep_decrypt(private_key, cipher_bytes: bytes) -> bytes:
+    start = time.perf_counter()
+    data = private_key.decrypt(cipher_bytes, OAEP_PADDING)
+    OAEP_DECRYPT_TIMER.since(start)
+    return data
+
 
 class RsaService:
+    def __init__(self, cache_size: Optional[int] = None):
+        if cache_size is None:
+            cache_size = int(os.environ.get("RSA_KEY_CACHE_SIZE", "256"))
+        self.key_cache = ParsedKeyCache(cache_size)
+
     def generate_crypto_keys(self) -> RsaKeys:
+        start = time.perf_counter()
         private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        KEYGEN_TIMER.since(start)
         public_key = private_key.public_key()
 
         private_pem = private_key.private_bytes(
@@ -24,29 +144,63 @@ class RsaService:
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         ).decode("utf-8")
 
-        return RsaKeys(public_key=public_pem, private_key=private_pem)
-
-    def encrypt(self, public_key_pem: str, plain_text: str) -> str:
-        public_key = serialization.load_pem_public_key(public_key_pem.encode("utf-8"))
-        cipher_text = public_key.encrypt(
-            plain_text.encode("utf-8"),
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
+        return RsaKeys(
+            public_key=public_pem,
+            private_key=private_pem,
+            public_key_obj=public_key,
+            private_key_obj=private_key
         )
+
+    def load_public_key(self, public_key: Union[str, RsaKeys]):
+        """Приймає PEM або RsaKeys; RsaKeys зберігає розібраний ключ у собі, PEM кешується за відбитком."""
+        if isinstance(public_key, RsaKeys):
+            if public_key.public_key_obj is None:
+                public_key.public_key_obj = self.load_public_key(public_key.public_key)
+            return public_key.public_key_obj
+        return self.key_cache.get_or_load(public_key, parse_public_pem)
+
+    def load_private_key(self, private_key: Union[str, RsaKeys]):
+        if isinstance(private_key, RsaKeys):
+            if private_key.private_key_obj is None:
+                private_key.private_key_obj = self.load_private_key(private_key.private_key)
+            return private_key.private_key_obj
+        return self.key_cache.get_or_load(private_key, parse_private_pem)
+
+    def encrypt_bytes(self, public_key: Union[str, RsaKeys], data: bytes) -> bytes:
+        return oaep_encrypt(self.load_public_key(public_key), data)
+
+    def decrypt_bytes(self, private_key: Union[str, RsaKeys], cipher_bytes: bytes) -> bytes:
+        """Розпізнає формат сам: звичайний RSA-OAEP шифротекст або конверт з encrypt_envelope."""
+        key = self.load_private_key(private_key)
+        if is_envelope(cipher_bytes, key):
+            return self._open_envelope(key, cipher_bytes)
+        return oaep_decrypt(key, cipher_bytes)
+
+    def encrypt_envelope(self, public_key: Union[str, RsaKeys], data: bytes) -> bytes:
+        """Шифрує дані будь-якого розміру: RSA лише для свіжого ключа AES, самі дані - AES-GCM."""
+        data_key = AESGCM.generate_key(bit_length=256)
+        wrapped_key = oaep_encrypt(self.load_public_key(public_key), data_key)
+        header = ENVELOPE_MAGIC + len(wrapped_key).to_bytes(2, "big") + wrapped_key
+        nonce = os.urandom(ENVELOPE_NONCE_SIZE)
+        return header + nonce + AESGCM(data_key).encrypt(nonce, data, header)
+
+    def decrypt_envelope(self, private_key: Union[str, RsaKeys], blob: bytes) -> bytes:
+        return self._open_envelope(self.load_private_key(private_key), blob)
+
+    def _open_envelope(self, private_key, blob: bytes) -> bytes:
+        view = memoryview(blob)
+        prefix = len(ENVELOPE_MAGIC) + 2
+        header_end = prefix + int.from_bytes(view[len(ENVELOPE_MAGIC):prefix], "big")
+        if len(blob) < header_end + ENVELOPE_NONCE_SIZE + ENVELOPE_TAG_SIZE:
+            raise ValueError("Envelope is too short")
+        data_key = oaep_decrypt(private_key, bytes(view[prefix:header_end]))
+        nonce = view[header_end:header_end + ENVELOPE_NONCE_SIZE]
+        return AESGCM(data_key).decrypt(nonce, view[header_end + ENVELOPE_NONCE_SIZE:], view[:header_end])
+
+    def encrypt(self, public_key: Union[str, RsaKeys], plain_text: str) -> str:
+        cipher_text = self.encrypt_bytes(public_key, plain_text.encode("utf-8"))
         return base64.b64encode(cipher_text).decode("utf-8")
 
-    def decrypt(self, private_key_pem: str, cipher_text_b64: str) -> str:
-        private_key = serialization.load_pem_private_key(private_key_pem.encode("utf-8"), password=None)
-        cipher_bytes = base64.b64decode(cipher_text_b64)
-        plain_bytes = private_key.decrypt(
-            cipher_bytes,
-            padding.OAEP(
-                mgf=padding.MGF1(algorithm=hashes.SHA256()),
-                algorithm=hashes.SHA256(),
-                label=None
-            )
-        )
+    def decrypt(self, private_key: Union[str, RsaKeys], cipher_text_b64: str) -> str:
+        plain_bytes = self.decrypt_bytes(private_key, base64.b64decode(cipher_text_b64))
         return plain_bytes.decode("utf-8")
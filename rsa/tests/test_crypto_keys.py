@@ -0,0 +1,143 @@
+import base64
+import os
+import pytest
+from fastapi.testclient import TestClient
+from src.models.rsa_batch import batch_pool
+from src.models.rsa_key_pool import key_pool
+from src.models.rsa_service import RsaService, ENVELOPE_MAGIC, is_envelope
+
+
+@pytest.fixture(scope="module")
+def http():
+    """Застосунок з lifespan: пул ключів і пул процесів для пакетів (два процеси, щоб пакет ділився на частини)."""
+    import main
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(batch_pool, "workers", 2)
+        mp.setattr(key_pool, "low_watermark", 1)
+        mp.setattr(key_pool, "high_watermark", 2)
+        with TestClient(main.app) as client:
+            yield client
+
+
+@pytest.fixture(scope="module")
+def key_id(http):
+    return http.post("/api/generate/rsa-keys").json()["id"]
+
+
+def b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("utf-8")
+
+
+def test_envelope_round_trip(http, key_id):
+    plain_text = "конверт " * 1000
+
+    cipher_text = http.post(
+        "/api/encrypt", json={"key_id": key_id, "plain_text": plain_text, "envelope": True}
+    ).json()["cipher_text"]
+    response = http.post("/api/decrypt", json={"key_id": key_id, "cipher_text": cipher_text})
+
+    assert base64.b64decode(cipher_text).startswith(ENVELOPE_MAGIC)
+    assert response.status_code == 200
+    assert response.json()["plain_text"] == plain_text
+
+
+def test_binary_envelope_round_trip(http, key_id):
+    data = os.urandom(64 * 1024)
+    headers = {"content-type": "application/octet-stream", "x-key-id": str(key_id)}
+
+    blob = http.post("/api/encrypt", content=data, headers={**headers, "x-envelope": "true"}).content
+    response = http.post("/api/decrypt", content=blob, headers=headers)
+
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_plain_payload_is_not_mistaken_for_envelope(http, key_id):
+    # Відкритий текст з тим самим префіксом, що й конверт, шифрується і розшифровується звичайним RSA
+    plain_text = ENVELOPE_MAGIC.decode("ascii") + " not an envelope"
+    cipher_text = http.post("/api/encrypt", json={"key_id": key_id, "plain_text": plain_text}).json()["cipher_text"]
+
+    response = http.post("/api/decrypt", json={"key_id": key_id, "cipher_text": cipher_text})
+
+    assert response.json()["plain_text"] == plain_text
+    # Шифротекст розміром з модуль - завжди звичайний RSA, навіть якщо починається з MAGIC
+    private_key = RsaService().load_private_key(http.post("/api/generate/rsa-keys").json()["private_key"])
+    assert not is_envelope(ENVELOPE_MAGIC + bytes(private_key.key_size // 8 - len(ENVELOPE_MAGIC)), private_key)
+    assert is_envelope(ENVELOPE_MAGIC + bytes(private_key.key_size // 8), private_key)
+
+
+def test_truncated_envelope_is_rejected(http, key_id):
+    blob = base64.b64decode(http.post(
+        "/api/encrypt", json={"key_id": key_id, "plain_text": "secret", "envelope": True}
+    ).json()["cipher_text"])
+
+    response = http.post("/api/decrypt", json={"key_id": key_id, "cipher_text": b64(blob[:-1])})
+
+    assert response.status_code == 400
+
+
+def test_batch_results_keep_request_order(http, key_id):
+    plain_texts = [f"item {i}" for i in range(40)]
+    encrypted = http.post("/api/encrypt/batch", json={"key_id": key_id, "plain_texts": plain_texts}).json()
+    cipher_texts = [item["cipher_text"] for item in encrypted]
+    cipher_texts[3] = "not base64!"
+    cipher_texts[17] = b64(os.urandom(256))
+    cipher_texts[30] = b64(base64.b64decode(cipher_texts[30])[:-1])
+
+    response = http.post("/api/decrypt/batch", json={"key_id": key_id, "cipher_texts": cipher_texts})
+
+    assert batch_pool.executor is not None
+    results = response.json()
+    assert [item["index"] for item in results] == list(range(40))
+    assert [i for i, item in enumerate(results) if item["status"] == 400] == [3, 17, 30]
+    assert all(
+        item["plain_text"] == plain_texts[i] for i, item in enumerate(results) if item["status"] == 200
+    )
+
+
+def test_encrypt_batch_reports_items_too_long_for_rsa(http, key_id):
+    plain_texts = ["short", "x" * 1000, "also short"]
+
+    results = http.post("/api/encrypt/batch", json={"key_id": key_id, "plain_texts": plain_texts}).json()
+
+    assert [(item["index"], item["status"]) for item in results] == [(0, 200), (1, 400), (2, 200)]
+    enveloped = http.post(
+        "/api/encrypt/batch", json={"key_id": key_id, "plain_texts": plain_texts, "envelope": True}
+    ).json()
+    assert [item["status"] for item in enveloped] == [200, 200, 200]
+
+
+def test_batch_timeout_is_503(http, key_id, monkeypatch):
+    cipher_texts = [
+        item["cipher_text"]
+        for item in http.post("/api/encrypt/batch", json={"key_id": key_id, "plain_texts": ["x"] * 40}).json()
+    ]
+    monkeypatch.setattr(batch_pool, "timeout", 0)
+
+    response = http.post("/api/decrypt/batch", json={"key_id": key_id, "cipher_texts": cipher_texts})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"]
+
+
+def test_unknown_key_id_is_404(http):
+    unknown = 10 ** 9
+
+    assert http.get(f"/api/rsa-public-key/{unknown}").status_code == 404
+    assert http.post("/api/encrypt", json={"key_id": unknown, "plain_text": "x"}).status_code == 404
+    assert http.post("/api/decrypt", json={"key_id": unknown, "cipher_text": b64(b"x")}).status_code == 404
+    assert http.post("/api/decrypt/batch", json={"key_id": unknown, "cipher_texts": [b64(b"x")]}).status_code == 404
+    response = http.post(
+        "/api/decrypt", content=b"x", headers={"content-type": "application/octet-stream", "x-key-id": str(unknown)}
+    )
+    assert response.status_code == 404
+
+
+def test_malformed_key_is_400(http):
+    binary = {"content-type": "application/octet-stream"}
+
+    assert http.post("/api/encrypt", content=b"x", headers={**binary, "x-key-id": "abc"}).status_code == 400
+    assert http.post("/api/decrypt", content=b"x", headers={**binary, "x-key-id": "-1"}).status_code == 400
+    assert http.post("/api/encrypt", json={"plain_text": "x"}).status_code == 400
+    response = http.post("/api/encrypt", json={"public_key_base64": "not base64!", "plain_text": "x"})
+    assert response.status_code == 400